@@ -1,5 +1,6 @@
 from django.apps import AppConfig
-from django.utils.translation import gettext_lazy as _
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _, trans_real
 
 class CoreConfig(AppConfig):
     name = 'apps.core'
@@ -7,4 +8,7 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         """تهيئة التطبيق"""
-        pass
+        # تحميل ملفات الترجمة للغات المدعومة مرة واحدة عند بدء كل عملية
+        # بدلاً من تحميلها عند أول طلب بكل لغة
+        for language_code, _name in settings.LANGUAGES:
+            trans_real.translation(language_code)
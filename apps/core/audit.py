@@ -9,25 +9,33 @@ from django.utils import timezone
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-import threading
+from django.core.signals import setting_changed
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextvars import ContextVar
+from functools import lru_cache
 import json
 
-# متغير محلي للموجه لتخزين كائن الطلب الحالي
-_thread_locals = threading.local()
+# متغيرات السياق لتخزين كائن الطلب والمستخدم الحالي
+# (آمنة مع العروض غير المتزامنة بخلاف threading.local)
+_request_var: ContextVar = ContextVar('audit_request', default=None)
+_user_var: ContextVar = ContextVar('audit_user', default=None)
+
+# الطول الأقصى لحقل LogEntry.object_repr
+OBJECT_REPR_MAX_LENGTH = LogEntry._meta.get_field('object_repr').max_length
 
 
 def get_current_user():
     """
-    الحصول على المستخدم الحالي من الموجه المحلي
+    الحصول على المستخدم الحالي من سياق الطلب
     """
-    return getattr(_thread_locals, 'user', None)
+    return _user_var.get()
 
 
 def get_client_ip():
     """
-    الحصول على عنوان IP للعميل من الموجه المحلي
+    الحصول على عنوان IP للعميل من سياق الطلب
     """
-    request = getattr(_thread_locals, 'request', None)
+    request = _request_var.get()
     if request:
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -40,32 +48,106 @@ def get_client_ip():
 
 class AuditMiddleware:
     """
-    وسيط لتخزين كائن الطلب والمستخدم الحالي في الموجه المحلي
+    وسيط لتخزين كائن الطلب والمستخدم الحالي في سياق الطلب
     """
-    
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-    
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # تخزين كائن الطلب والمستخدم الحالي
-        _thread_locals.request = request
-        _thread_locals.user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
-        
-        response = self.get_response(request)
-        
-        # إزالة كائن الطلب والمستخدم من الموجه المحلي
-        if hasattr(_thread_locals, 'request'):
-            del _thread_locals.request
-        if hasattr(_thread_locals, 'user'):
-            del _thread_locals.user
-        
-        return response
+        user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
+        request_token = _request_var.set(request)
+        user_token = _user_var.set(user)
+        try:
+            return self.get_response(request)
+        finally:
+            # إعادة السياق إلى حالته السابقة
+            _user_var.reset(user_token)
+            _request_var.reset(request_token)
+
+    async def __acall__(self, request):
+        """
+        المسار غير المتزامن (ASGI) للوسيط
+        """
+        user = None
+        if hasattr(request, 'auser'):
+            user = await request.auser()
+            if not user.is_authenticated:
+                user = None
+        request_token = _request_var.set(request)
+        user_token = _user_var.set(user)
+        try:
+            return await self.get_response(request)
+        finally:
+            _user_var.reset(user_token)
+            _request_var.reset(request_token)
 
 
 class AuditLogManager:
     """
     مدير سجل التدقيق باستخدام نظام LogEntry في Django
     """
+
+    # الحقول المطلوبة عند عرض السجلات (تجنب جلب الأعمدة والعلاقات غير المستخدمة)
+    HISTORY_FIELDS = (
+        'action_time',
+        'action_flag',
+        'object_id',
+        'object_repr',
+        'change_message',
+        'user',
+        'user__username',
+        'content_type',
+        'content_type__app_label',
+        'content_type__model',
+    )
+
+    # ذاكرة مؤقتة على مستوى العملية: نوع النموذج -> معرف ContentType
+    _ct_cache: dict = {}
+
+    @classmethod
+    def _get_ct_id(cls, model_cls):
+        """
+        الحصول على معرف ContentType للنموذج مع التخزين المؤقت
+
+        :param model_cls: فئة النموذج
+        :return: معرف ContentType
+        """
+        try:
+            return cls._ct_cache[model_cls]
+        except KeyError:
+            ct_id = ContentType.objects.get_for_model(model_cls).pk
+            return cls._ct_cache.setdefault(model_cls, ct_id)
+
+    @staticmethod
+    def _object_repr(obj):
+        """
+        تمثيل الكائن النصي مرة واحدة لكل سجل، مقتطعاً إلى طول حقل object_repr
+
+        :param obj: الكائن
+        :return: نص التمثيل
+        """
+        try:
+            return force_str(obj)[:OBJECT_REPR_MAX_LENGTH]
+        except Exception:
+            # قد يفشل __str__ بعد الحذف إذا اعتمد على علاقات محذوفة
+            return f"{obj.__class__.__name__} object ({obj.pk})"[:OBJECT_REPR_MAX_LENGTH]
+
+    @classmethod
+    def clear_ct_cache(cls):
+        """
+        مسح ذاكرة معرفات ContentType المؤقتة
+        """
+        cls._ct_cache.clear()
     
     @staticmethod
     def log_addition(user, obj, message=None):
@@ -83,14 +165,16 @@ class AuditLogManager:
         if not user:
             return None
         
+        object_repr = AuditLogManager._object_repr(obj)
+
         if not message:
-            message = f"Added {obj.__class__.__name__}: {str(obj)}"
+            message = f"Added {obj.__class__.__name__}: {object_repr}"
         
         return LogEntry.objects.log_action(
             user_id=user.pk,
-            content_type_id=ContentType.objects.get_for_model(obj).pk,
+            content_type_id=AuditLogManager._get_ct_id(type(obj)),
             object_id=obj.pk,
-            object_repr=force_str(obj),
+            object_repr=object_repr,
             action_flag=ADDITION,
             change_message=message
         )
@@ -112,20 +196,19 @@ class AuditLogManager:
         if not user:
             return None
         
-        if not message:
-            message = f"Changed {obj.__class__.__name__}: {str(obj)}"
-        
+        object_repr = AuditLogManager._object_repr(obj)
+
         if changed_data:
-            if isinstance(changed_data, dict):
-                message = json.dumps([{'changed': {'fields': list(changed_data.keys())}}])
-            else:
-                message = json.dumps([{'changed': {'fields': changed_data}}])
+            fields = list(changed_data) if isinstance(changed_data, dict) else changed_data
+            message = json.dumps([{'changed': {'fields': fields}}], separators=(',', ':'))
+        elif not message:
+            message = f"Changed {obj.__class__.__name__}: {object_repr}"
         
         return LogEntry.objects.log_action(
             user_id=user.pk,
-            content_type_id=ContentType.objects.get_for_model(obj).pk,
+            content_type_id=AuditLogManager._get_ct_id(type(obj)),
             object_id=obj.pk,
-            object_repr=force_str(obj),
+            object_repr=object_repr,
             action_flag=CHANGE,
             change_message=message
         )
@@ -146,14 +229,16 @@ class AuditLogManager:
         if not user:
             return None
         
+        object_repr = AuditLogManager._object_repr(obj)
+
         if not message:
-            message = f"Deleted {obj.__class__.__name__}: {str(obj)}"
+            message = f"Deleted {obj.__class__.__name__}: {object_repr}"
         
         return LogEntry.objects.log_action(
             user_id=user.pk,
-            content_type_id=ContentType.objects.get_for_model(obj).pk,
+            content_type_id=AuditLogManager._get_ct_id(type(obj)),
             object_id=obj.pk,
-            object_repr=force_str(obj),
+            object_repr=object_repr,
             action_flag=DELETION,
             change_message=message
         )
@@ -170,6 +255,8 @@ class AuditLogManager:
         return LogEntry.objects.filter(
             content_type=content_type,
             object_id=obj.pk
+        ).select_related('user', 'content_type').only(
+            *AuditLogManager.HISTORY_FIELDS
         ).order_by('-action_time')
     
     @staticmethod
@@ -180,29 +267,59 @@ class AuditLogManager:
         :param user: المستخدم
         :return: قائمة بسجلات الإجراءات
         """
-        return LogEntry.objects.filter(user=user).order_by('-action_time')
+        return LogEntry.objects.filter(
+            user=user
+        ).select_related('user', 'content_type').only(
+            *AuditLogManager.HISTORY_FIELDS
+        ).order_by('-action_time')
 
 
 # إشارات لتسجيل التغييرات تلقائيًا
 
+# النماذج الأساسية التي لا تحتاج إلى تتبع
+_IGNORED_MODELS = frozenset({
+    f"{LogEntry.__module__}.{LogEntry.__name__}",
+    f"{ContentType.__module__}.{ContentType.__name__}",
+    'django.contrib.sessions.models.Session',
+})
+
+# النماذج المستثناة في الإعدادات (AUDIT_EXCLUDED_MODELS)
+_EXCLUDED_MODELS = frozenset(getattr(settings, 'AUDIT_EXCLUDED_MODELS', ()))
+
+
+@lru_cache(maxsize=512)
+def _sender_key(sender):
+    """
+    المسار الكامل لفئة النموذج (يحسب مرة واحدة لكل نموذج)
+    """
+    return f"{sender.__module__}.{sender.__name__}"
+
+
+def _is_ignored_sender(sender):
+    """
+    هل يجب تجاهل إشارات هذا النموذج؟
+    """
+    key = _sender_key(sender)
+    return key in _IGNORED_MODELS or key in _EXCLUDED_MODELS
+
+
+@receiver(setting_changed)
+def reload_excluded_models(setting, **kwargs):
+    """
+    إعادة تحميل النماذج المستثناة عند تغيير الإعداد (مثل override_settings)
+    """
+    global _EXCLUDED_MODELS
+    if setting == 'AUDIT_EXCLUDED_MODELS':
+        _EXCLUDED_MODELS = frozenset(getattr(settings, 'AUDIT_EXCLUDED_MODELS', ()))
+
+
 @receiver(post_save)
-def log_model_changes(sender, instance, created, **kwargs):
+def log_model_changes(sender, instance, created, update_fields=None, **kwargs):
     """
     تسجيل التغييرات في النماذج
     """
-    # تجاهل بعض النماذج الأساسية التي لا تحتاج إلى تتبع
-    ignored_models = [
-        LogEntry,
-        ContentType,
-        'django.contrib.sessions.models.Session',
-    ]
-    
-    if sender in ignored_models or sender.__name__ in [m.__name__ for m in ignored_models if hasattr(m, '__name__')]:
-        return
-    
-    # تجاهل النماذج المستثناة في الإعدادات
-    excluded_models = getattr(settings, 'AUDIT_EXCLUDED_MODELS', [])
-    if sender.__module__ + '.' + sender.__name__ in excluded_models:
+    # تجاهل النماذج الأساسية والنماذج المستثناة في الإعدادات
+    if _is_ignored_sender(sender):
         return
     
     # الحصول على المستخدم الحالي
@@ -215,8 +332,12 @@ def log_model_changes(sender, instance, created, **kwargs):
     if created:
         AuditLogManager.log_addition(user, instance)
     else:
-        # يمكن تحسين هذا لتتبع الحقول المتغيرة
-        AuditLogManager.log_change(user, instance)
+        # تسجيل الحقول المحدثة فقط عند توفرها
+        AuditLogManager.log_change(
+            user,
+            instance,
+            changed_data=list(update_fields) if update_fields else None
+        )
 
 
 @receiver(post_delete)
@@ -224,19 +345,8 @@ def log_model_deletion(sender, instance, **kwargs):
     """
     تسجيل حذف النماذج
     """
-    # تجاهل بعض النماذج الأساسية التي لا تحتاج إلى تتبع
-    ignored_models = [
-        LogEntry,
-        ContentType,
-        'django.contrib.sessions.models.Session',
-    ]
-    
-    if sender in ignored_models or sender.__name__ in [m.__name__ for m in ignored_models if hasattr(m, '__name__')]:
-        return
-    
-    # تجاهل النماذج المستثناة في الإعدادات
-    excluded_models = getattr(settings, 'AUDIT_EXCLUDED_MODELS', [])
-    if sender.__module__ + '.' + sender.__name__ in excluded_models:
+    # تجاهل النماذج الأساسية والنماذج المستثناة في الإعدادات
+    if _is_ignored_sender(sender):
         return
     
     # الحصول على المستخدم الحالي
@@ -249,6 +359,14 @@ def log_model_deletion(sender, instance, **kwargs):
     AuditLogManager.log_deletion(user, instance)
 
 
+@receiver(post_delete, sender=ContentType)
+def clear_content_type_cache(sender, **kwargs):
+    """
+    مسح ذاكرة معرفات ContentType عند حذف نوع محتوى (مثل remove_stale_contenttypes)
+    """
+    AuditLogManager.clear_ct_cache()
+
+
 # زخارف للتسجيل اليدوي
 
 def audit_view(action_type):
@@ -7,7 +7,21 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from enum import Enum
+from types import MappingProxyType
+
+# ذاكرة مؤقتة لإعدادات الترقيم: (الفئة، المفتاح) -> إعدادات للقراءة فقط
+_SETTINGS_CACHE: Dict[tuple, MappingProxyType] = {}
+
+
+@receiver(setting_changed)
+def _clear_settings_cache(setting, **kwargs):
+    """مسح ذاكرة الإعدادات عند تغيير إعدادات الترقيم (مثل override_settings)"""
+    if setting.endswith('_NUMBERING_SETTINGS'):
+        _SETTINGS_CACHE.clear()
+
 
 class NumberingPattern(Enum):
     """أنماط الترقيم المدعومة"""
@@ -21,6 +35,18 @@ class NumberingPattern(Enum):
 class BaseNumberingSystem:
     """نظام الترقيم العام - يدعم أنماط متعددة لتوليد وتنسيق الأرقام أو الرموز"""
 
+    __slots__ = (
+        'pattern',
+        'prefix',
+        'suffix',
+        'separator',
+        'min_value',
+        'max_value',
+        'padding',
+        'ignored_words',
+        '_fmt',
+    )
+
     # الإعدادات الافتراضية
     DEFAULT_PATTERN = NumberingPattern.NUMERIC
     DEFAULT_PREFIX = ''
@@ -39,8 +65,13 @@ class BaseNumberingSystem:
             key: مفتاح الإعدادات (مثل 'COLLEGE' أو 'DEPARTMENT')
             
         Returns:
-            dict: الإعدادات المستخرجة من ملف الإعدادات أو الافتراضية
+            dict: الإعدادات المستخرجة من ملف الإعدادات أو الافتراضية (للقراءة فقط)
         """
+        cache_key = (cls, key)
+        cached = _SETTINGS_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
         default_settings = {
             'pattern': cls.DEFAULT_PATTERN,
             'prefix': cls.DEFAULT_PREFIX,
@@ -52,7 +83,10 @@ class BaseNumberingSystem:
             'ignored_words': cls.DEFAULT_IGNORED_WORDS
         }
         
-        return getattr(settings, f'{key}_NUMBERING_SETTINGS', default_settings)
+        config = MappingProxyType(
+            dict(getattr(settings, f'{key}_NUMBERING_SETTINGS', default_settings))
+        )
+        return _SETTINGS_CACHE.setdefault(cache_key, config)
 
     def __init__(
         self,
@@ -88,6 +122,28 @@ class BaseNumberingSystem:
             self.padding = padding or self.DEFAULT_PADDING
             self.ignored_words = ignored_words or self.DEFAULT_IGNORED_WORDS
 
+        self._fmt = self._compile_formatter()
+
+    def _compile_formatter(self):
+        """بناء دالة تنسيق مخصصة للنسخة الحالية
+
+        الخصائص (البادئة، اللاحقة، الفاصل، الطول) ثابتة بعد الإنشاء، لذلك يتم
+        تجميع قالب التنسيق مرة واحدة بدلاً من إعادة تقييم الشروط في كل استدعاء.
+        """
+        def escape(text):
+            return str(text).replace('{', '{{').replace('}', '}}')
+
+        parts = []
+        if self.prefix:
+            parts.append(escape(self.prefix) + escape(self.separator))
+        if self.pattern == NumberingPattern.NUMERIC:
+            parts.append(f'{{n:0{self.padding}d}}')
+        else:
+            parts.append('{n}')
+        if self.suffix:
+            parts.append(escape(self.separator) + escape(self.suffix))
+        return ''.join(parts).format
+
     def generate_number(self, model_class, **kwargs):
         """توليد رقم جديد حسب النمط المحدد"""
         if self.pattern == NumberingPattern.NUMERIC:
@@ -209,15 +265,18 @@ class BaseNumberingSystem:
 
     def format_number(self, number):
         """تنسيق الرقم"""
-        formatted = str(number)
+        if isinstance(number, int):
+            return self._fmt(n=number)
 
+        # القيم غير الصحيحة (مثل النصوص المرقمة مسبقاً) لا تدعم مواصفة 'd'
+        core = str(number)
         if self.pattern == NumberingPattern.NUMERIC:
-            formatted = str(number).zfill(self.padding)
+            core = core.zfill(self.padding)
 
+        if self.prefix and self.suffix:
+            return f"{self.prefix}{self.separator}{core}{self.separator}{self.suffix}"
         if self.prefix:
-            formatted = f"{self.prefix}{self.separator}{formatted}"
-
+            return f"{self.prefix}{self.separator}{core}"
         if self.suffix:
-            formatted = f"{formatted}{self.separator}{self.suffix}"
-
-        return formatted
+            return f"{core}{self.separator}{self.suffix}"
+        return core
@@ -5,12 +5,89 @@
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import user_passes_test
+from django.core.exceptions import PermissionDenied
+from functools import lru_cache
 
 User = get_user_model()
 
+# الأدوار التي تقتصر على المشرفين (يتم التحقق منها دون أي استعلام)
+SUPERUSER_ROLES = frozenset(getattr(settings, 'SUPERUSER_ROLES', ()))
+
+
+def _get_cached_group_names(user):
+    """
+    الحصول على أسماء مجموعات المستخدم مع تخزينها على كائن المستخدم
+
+    يتم تنفيذ استعلام واحد فقط لكل كائن مستخدم (أي لكل طلب)، وتتم
+    عمليات التحقق اللاحقة من الأدوار في الذاكرة.
+
+    :param user: المستخدم
+    :return: مجموعة ثابتة بأسماء المجموعات
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    if not hasattr(user, '_cached_group_names'):
+        user._cached_group_names = frozenset(user.groups.values_list('name', flat=True))
+    return user._cached_group_names
+
+
+@lru_cache(maxsize=1024)
+def _transition_perm(app_label, source_state, target_state):
+    """
+    بناء اسم صلاحية انتقال سير العمل (مع التخزين المؤقت)
+    """
+    return f"{app_label}.can_transition_{source_state}_to_{target_state}"
+
+
+# ذاكرة مؤقتة على مستوى العملية: (app_label, codename) -> معرف الصلاحية
+_PERMISSION_ID_CACHE = {}
+
+
+def _get_permission_id(codename, app_label=None):
+    """
+    الحصول على معرف الصلاحية بالرمز دون جلب الصف كاملاً
+
+    يتم تخزين المعرفات الموجودة فقط، حتى لا تُخفى الصلاحيات المنشأة لاحقًا.
+
+    :param codename: رمز الصلاحية
+    :param app_label: تسمية التطبيق (اختياري)
+    :return: معرف الصلاحية أو None
+    """
+    cache_key = (app_label, codename)
+    permission_id = _PERMISSION_ID_CACHE.get(cache_key)
+    
+    if permission_id is None:
+        query = Q(codename=codename)
+        if app_label:
+            query &= Q(content_type__app_label=app_label)
+        permission_id = Permission.objects.filter(query).values_list('id', flat=True).first()
+        if permission_id is not None:
+            _PERMISSION_ID_CACHE[cache_key] = permission_id
+    
+    return permission_id
+
+
+@receiver(post_delete, sender=Permission)
+def _clear_permission_id_cache(sender, **kwargs):
+    """
+    مسح ذاكرة معرفات الصلاحيات عند حذف صلاحية
+    """
+    _PERMISSION_ID_CACHE.clear()
+
+
+def _clear_cached_group_names(user):
+    """
+    إزالة أسماء المجموعات المخزنة على كائن المستخدم بعد تعديل أدواره
+    """
+    user.__dict__.pop('_cached_group_names', None)
+
 
 class RoleManager:
     """
@@ -44,10 +121,7 @@ class RoleManager:
         :param name: اسم الدور
         :return: كائن Group أو None
         """
-        try:
-            return Group.objects.get(name=name)
-        except Group.DoesNotExist:
-            return None
+        return Group.objects.filter(name=name).first()
     
     @staticmethod
     def delete_role(name):
@@ -57,12 +131,12 @@ class RoleManager:
         :param name: اسم الدور
         :return: True إذا تم الحذف، False إذا لم يتم العثور على الدور
         """
-        try:
-            group = Group.objects.get(name=name)
-            group.delete()
-            return True
-        except Group.DoesNotExist:
+        group = Group.objects.filter(name=name).first()
+        if group is None:
             return False
+        
+        group.delete()
+        return True
     
     @staticmethod
     def get_all_roles():
@@ -81,11 +155,11 @@ class RoleManager:
         :param role_name: اسم الدور
         :return: قائمة بالصلاحيات
         """
-        try:
-            group = Group.objects.get(name=role_name)
-            return group.permissions.all()
-        except Group.DoesNotExist:
+        group = Group.objects.filter(name=role_name).first()
+        if group is None:
             return []
+        
+        return group.permissions.all()
     
     @staticmethod
     def add_permission_to_role(role_name, permission):
@@ -96,12 +170,12 @@ class RoleManager:
         :param permission: الصلاحية
         :return: True إذا تمت الإضافة، False إذا لم يتم العثور على الدور
         """
-        try:
-            group = Group.objects.get(name=role_name)
-            group.permissions.add(permission)
-            return True
-        except Group.DoesNotExist:
+        group = Group.objects.filter(name=role_name).first()
+        if group is None:
             return False
+        
+        group.permissions.add(permission)
+        return True
     
     @staticmethod
     def remove_permission_from_role(role_name, permission):
@@ -112,12 +186,12 @@ class RoleManager:
         :param permission: الصلاحية
         :return: True إذا تمت الإزالة، False إذا لم يتم العثور على الدور
         """
-        try:
-            group = Group.objects.get(name=role_name)
-            group.permissions.remove(permission)
-            return True
-        except Group.DoesNotExist:
+        group = Group.objects.filter(name=role_name).first()
+        if group is None:
             return False
+        
+        group.permissions.remove(permission)
+        return True
     
     @staticmethod
     def assign_role_to_user(user, role_name):
@@ -128,12 +202,13 @@ class RoleManager:
         :param role_name: اسم الدور
         :return: True إذا تم التعيين، False إذا لم يتم العثور على الدور
         """
-        try:
-            group = Group.objects.get(name=role_name)
-            user.groups.add(group)
-            return True
-        except Group.DoesNotExist:
+        group = Group.objects.filter(name=role_name).first()
+        if group is None:
             return False
+        
+        user.groups.add(group)
+        _clear_cached_group_names(user)
+        return True
     
     @staticmethod
     def remove_role_from_user(user, role_name):
@@ -144,12 +219,13 @@ class RoleManager:
         :param role_name: اسم الدور
         :return: True إذا تمت الإزالة، False إذا لم يتم العثور على الدور
         """
-        try:
-            group = Group.objects.get(name=role_name)
-            user.groups.remove(group)
-            return True
-        except Group.DoesNotExist:
+        group = Group.objects.filter(name=role_name).first()
+        if group is None:
             return False
+        
+        user.groups.remove(group)
+        _clear_cached_group_names(user)
+        return True
     
     @staticmethod
     def get_user_roles(user):
@@ -170,7 +246,7 @@ class RoleManager:
         :param role_name: اسم الدور
         :return: True إذا كان لديه الدور، False إذا لم يكن
         """
-        return user.groups.filter(name=role_name).exists()
+        return role_name in _get_cached_group_names(user)
 
 
 class PermissionManager:
@@ -230,9 +306,10 @@ class PermissionManager:
             return Permission.objects.all()
         
         # الحصول على الصلاحيات من المجموعات والصلاحيات المباشرة
-        return Permission.objects.filter(
-            Q(group__user=user) | Q(user=user)
-        ).distinct()
+        # (UNION لاستعلامين بدلاً من OR عبر ربطين مع DISTINCT)
+        group_perms = Permission.objects.filter(group__user=user)
+        direct_perms = Permission.objects.filter(user=user)
+        return group_perms.union(direct_perms)
     
     @staticmethod
     def has_permission(user, permission_codename, app_label=None):
@@ -254,9 +331,62 @@ class PermissionManager:
         else:
             perm = permission_codename
         
-        # التحقق من صلاحيات المستخدم
+        # التحقق عبر خلفيات المصادقة المفعلة (تخزن الصلاحيات على كائن المستخدم)
         return user.has_perm(perm)
     
+    @staticmethod
+    def _resolve_permissions(codenames, app_label=None):
+        """
+        جلب كائنات الصلاحيات لمجموعة من الرموز باستعلام واحد
+        
+        :param codenames: قائمة برموز الصلاحيات
+        :param app_label: تسمية التطبيق (اختياري)
+        :return: قائمة بكائنات Permission
+        """
+        query = Q(codename__in=list(codenames))
+        
+        if app_label:
+            query &= Q(content_type__app_label=app_label)
+        
+        return list(Permission.objects.filter(query))
+    
+    @staticmethod
+    def add_permissions_to_user(user, codenames, app_label=None):
+        """
+        إضافة عدة صلاحيات مباشرة للمستخدم
+        
+        يتم جلب الصلاحيات باستعلام واحد وإضافتها بعملية إدراج واحدة
+        بدلاً من استعلامين لكل صلاحية.
+        
+        :param user: المستخدم
+        :param codenames: قائمة برموز الصلاحيات
+        :param app_label: تسمية التطبيق (اختياري)
+        :return: عدد الصلاحيات التي تم العثور عليها وإضافتها
+        """
+        permissions = PermissionManager._resolve_permissions(codenames, app_label)
+        
+        if permissions:
+            user.user_permissions.add(*permissions)
+        
+        return len(permissions)
+    
+    @staticmethod
+    def remove_permissions_from_user(user, codenames, app_label=None):
+        """
+        إزالة عدة صلاحيات مباشرة من المستخدم
+        
+        :param user: المستخدم
+        :param codenames: قائمة برموز الصلاحيات
+        :param app_label: تسمية التطبيق (اختياري)
+        :return: عدد الصلاحيات التي تم العثور عليها وإزالتها
+        """
+        permissions = PermissionManager._resolve_permissions(codenames, app_label)
+        
+        if permissions:
+            user.user_permissions.remove(*permissions)
+        
+        return len(permissions)
+    
     @staticmethod
     def add_permission_to_user(user, permission_codename, app_label=None):
         """
@@ -267,13 +397,13 @@ class PermissionManager:
         :param app_label: تسمية التطبيق (اختياري)
         :return: True إذا تمت الإضافة، False إذا لم يتم العثور على الصلاحية
         """
-        permission = PermissionManager.get_permission_by_codename(permission_codename, app_label)
+        permission_id = _get_permission_id(permission_codename, app_label)
         
-        if permission:
-            user.user_permissions.add(permission)
-            return True
+        if permission_id is None:
+            return False
         
-        return False
+        user.user_permissions.add(permission_id)
+        return True
     
     @staticmethod
     def remove_permission_from_user(user, permission_codename, app_label=None):
@@ -285,13 +415,13 @@ class PermissionManager:
         :param app_label: تسمية التطبيق (اختياري)
         :return: True إذا تمت الإزالة، False إذا لم يتم العثور على الصلاحية
         """
-        permission = PermissionManager.get_permission_by_codename(permission_codename, app_label)
+        permission_id = _get_permission_id(permission_codename, app_label)
         
-        if permission:
-            user.user_permissions.remove(permission)
-            return True
+        if permission_id is None:
+            return False
         
-        return False
+        user.user_permissions.remove(permission_id)
+        return True
 
 
 class WorkflowManager:
@@ -314,14 +444,13 @@ class WorkflowManager:
         if user.is_superuser:
             return True
         
-        # الحصول على نوع المحتوى
-        content_type = ContentType.objects.get_for_model(obj.__class__)
-        
-        # بناء رمز الصلاحية
-        permission_codename = f"can_transition_{source_state}_to_{target_state}"
+        # الحصول على نوع المحتوى (مخزن مؤقتًا في ContentTypeManager)
+        app_label = ContentType.objects.get_for_model(type(obj)).app_label
         
         # التحقق من صلاحيات المستخدم
-        return user.has_perm(f"{content_type.app_label}.{permission_codename}")
+        # ملاحظة: ModelBackend يخزن الصلاحيات على كائن المستخدم بعد أول استدعاء،
+        # لذا يفضل إعادة استخدام نفس كائن المستخدم عند التحقق من عدة كائنات
+        return user.has_perm(_transition_perm(app_label, source_state, target_state))
     
     @staticmethod
     def apply_transition(user, obj, target_state):
@@ -339,9 +468,11 @@ class WorkflowManager:
         if not WorkflowManager.check_transition_permission(user, obj, source_state, target_state):
             return False
         
-        # تغيير الحالة
+        # تغيير الحالة (حفظ حقل الحالة فقط)
+        # ملاحظة: تستقبل معالجات pre_save/post_save القيمة update_fields={'status'}
+        # ويمكنها تجاهل العمليات غير المتعلقة بالحالة
         obj.status = target_state
-        obj.save()
+        obj.save(update_fields=['status'])
         
         # تسجيل انتقال سير العمل (يمكن استخدام نظام التدقيق)
         
@@ -362,29 +493,36 @@ def permission_required(perm, login_url=None, raise_exception=False):
     return django_permission_required(perm, login_url=login_url, raise_exception=raise_exception)
 
 
-def role_required(role_name, login_url=None, raise_exception=False):
+def role_required(role_name, login_url=None, raise_exception=False, superuser_bypass=True):
     """
     زخرفة للتحقق من دور المستخدم
     
     :param role_name: اسم الدور المطلوب
     :param login_url: عنوان URL لتسجيل الدخول (اختياري)
     :param raise_exception: ما إذا كان يجب رفع استثناء PermissionDenied (اختياري)
+    :param superuser_bypass: ما إذا كان المشرفون يتجاوزون التحقق من الدور (اختياري)
     """
-    from django.contrib.auth.decorators import user_passes_test
-    from django.core.exceptions import PermissionDenied
+    # الأدوار المخصصة للمشرفين فقط (SUPERUSER_ROLES): لا حاجة لأي استعلام
+    if role_name in SUPERUSER_ROLES:
+        def check_superuser(user):
+            if user.is_authenticated and user.is_superuser:
+                return True
+            if raise_exception and user.is_authenticated:
+                raise PermissionDenied("You do not have the required role.")
+            return False
+        
+        return user_passes_test(check_superuser, login_url=login_url)
     
     def check_role(user):
         if not user.is_authenticated:
             return False
-        return user.is_superuser or RoleManager.has_role(user, role_name)
-    
-    if raise_exception:
-        def check_role(user):
-            if not user.is_authenticated:
-                return False
-            if user.is_superuser or RoleManager.has_role(user, role_name):
-                return True
+        if superuser_bypass and user.is_superuser:
+            return True
+        if role_name in _get_cached_group_names(user):
+            return True
+        if raise_exception:
             raise PermissionDenied("You do not have the required role.")
+        return False
     
     return user_passes_test(check_role, login_url=login_url)
 
@@ -398,13 +536,11 @@ def workflow_transition_permission(source_state, target_state, login_url=None, r
     :param login_url: عنوان URL لتسجيل الدخول (اختياري)
     :param raise_exception: ما إذا كان يجب رفع استثناء PermissionDenied (اختياري)
     """
-    from django.contrib.auth.decorators import user_passes_test
-    from django.core.exceptions import PermissionDenied
-    
     def check_transition_permission(user):
         if not user.is_authenticated:
             return False
         
+        # المشرفون لديهم جميع الصلاحيات (قبل أي استعلام)
         if user.is_superuser:
             return True
         
@@ -415,26 +551,11 @@ def workflow_transition_permission(source_state, target_state, login_url=None, r
         if not obj:
             return False
         
-        return WorkflowManager.check_transition_permission(user, obj, source_state, target_state)
-    
-    if raise_exception:
-        def check_transition_permission(user):
-            if not user.is_authenticated:
-                return False
-            
-            if user.is_superuser:
-                return True
-            
-            # الحصول على نوع المحتوى (يجب تحديده في العرض)
-            view_kwargs = getattr(user, '_view_kwargs', {})
-            obj = view_kwargs.get('object', None)
-            
-            if not obj:
-                return False
-            
-            if WorkflowManager.check_transition_permission(user, obj, source_state, target_state):
-                return True
-            
+        if WorkflowManager.check_transition_permission(user, obj, source_state, target_state):
+            return True
+        
+        if raise_exception:
             raise PermissionDenied("You do not have permission to perform this transition.")
+        return False
     
     return user_passes_test(check_transition_permission, login_url=login_url)
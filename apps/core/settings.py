@@ -7,7 +7,83 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.functional import cached_property
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 import json
+import time
+
+try:
+    import orjson
+except ImportError:  # orjson اختياري - الرجوع إلى مكتبة json القياسية
+    orjson = None
+
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(value):
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+
+# القيم النصية التي تعتبر صحيحة للإعدادات المنطقية
+_TRUE_VALUES = frozenset({'true', 'yes', '1', 'on', 't', 'y'})
+
+# دوال تحويل القيمة النصية حسب نوع البيانات
+_PARSERS = {
+    'string': lambda value: value,
+    'integer': int,
+    'float': float,
+    'boolean': lambda value: value.lower() in _TRUE_VALUES,
+    'json': _json_loads,
+    'date': parse_date,
+    'datetime': parse_datetime,
+}
+
+
+def _parse_value(data_type, value):
+    """
+    تحويل القيمة النصية إلى النوع المناسب
+    """
+    parser = _PARSERS.get(data_type)
+    if parser is None:
+        return value
+    return parser(value)
+
+
+# مفتاح رقم إصدار ذاكرة الإعدادات المؤقتة: كل مفاتيح الإعدادات تتضمن هذا الرقم،
+# وزيادته تجعل جميع القيم المخزنة سابقًا غير قابلة للوصول (وتنتهي بانتهاء مدتها)
+SETTINGS_EPOCH_KEY = 'system_settings_epoch'
+
+
+def _settings_epoch():
+    """
+    الحصول على رقم الإصدار الحالي لذاكرة الإعدادات المؤقتة
+    """
+    return cache.get_or_set(SETTINGS_EPOCH_KEY, lambda: int(time.time()), timeout=None)
+
+
+def _bump_settings_epoch():
+    """
+    زيادة رقم الإصدار لإبطال جميع الإعدادات المخزنة مؤقتًا
+    """
+    try:
+        cache.incr(SETTINGS_EPOCH_KEY)
+    except ValueError:
+        # المفتاح غير موجود (تمت إزالته): البدء من قيمة جديدة لا تتعارض مع القيم السابقة
+        cache.set(SETTINGS_EPOCH_KEY, int(time.time()), timeout=None)
+
+
+class SystemSettingManager(models.Manager):
+    """
+    مدير إعدادات النظام - يجلب المستخدم الذي قام بالتحديث مع الإعداد
+    """
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related('updated_by')
 
 
 class SystemSetting(models.Model):
@@ -73,6 +149,8 @@ class SystemSetting(models.Model):
         verbose_name=_('Updated By')
     )
     
+    objects = SystemSettingManager()
+    
     class Meta:
         verbose_name = _('System Setting')
         verbose_name_plural = _('System Settings')
@@ -81,27 +159,18 @@ class SystemSetting(models.Model):
     def __str__(self):
         return f"{self.key} ({self.get_setting_type_display()})"
     
+    @cached_property
+    def typed_value(self):
+        """
+        القيمة بالنوع المناسب (يتم التحويل مرة واحدة لكل كائن)
+        """
+        return _parse_value(self.data_type, self.value)
+    
     def get_typed_value(self):
         """
         الحصول على القيمة بالنوع المناسب
         """
-        if self.data_type == 'string':
-            return self.value
-        elif self.data_type == 'integer':
-            return int(self.value)
-        elif self.data_type == 'float':
-            return float(self.value)
-        elif self.data_type == 'boolean':
-            return self.value.lower() in ('true', 'yes', '1')
-        elif self.data_type == 'json':
-            return json.loads(self.value)
-        elif self.data_type == 'date':
-            from django.utils.dateparse import parse_date
-            return parse_date(self.value)
-        elif self.data_type == 'datetime':
-            from django.utils.dateparse import parse_datetime
-            return parse_datetime(self.value)
-        return self.value
+        return self.typed_value
     
     def save(self, *args, **kwargs):
         """
@@ -109,13 +178,18 @@ class SystemSetting(models.Model):
         """
         super().save(*args, **kwargs)
         
-        # إزالة ذاكرة التخزين المؤقت
-        cache_key = f"system_setting_{self.key}"
-        cache.delete(cache_key)
-        
-        # إزالة ذاكرة التخزين المؤقت لنوع الإعداد
-        cache_key = f"system_settings_{self.setting_type}"
-        cache.delete(cache_key)
+        # إعادة حساب القيمة المحولة عند الوصول التالي
+        # (ذاكرة التخزين المؤقت تُبطل عبر إشارة post_save)
+        self.__dict__.pop('typed_value', None)
+
+
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def invalidate_settings_cache(sender, **kwargs):
+    """
+    إبطال جميع إعدادات النظام المخزنة مؤقتًا بزيادة رقم الإصدار
+    """
+    _bump_settings_epoch()
 
 
 class SettingsManager:
@@ -134,7 +208,7 @@ class SettingsManager:
         :return: قيمة الإعداد
         """
         # التحقق من ذاكرة التخزين المؤقت
-        cache_key = f"system_setting_{key}"
+        cache_key = f"system_setting_{_settings_epoch()}_{key}"
         
         if use_cache:
             cached_value = cache.get(cache_key)
@@ -142,7 +216,7 @@ class SettingsManager:
                 return cached_value
         
         try:
-            setting = SystemSetting.objects.get(key=key)
+            setting = SystemSetting.objects.select_related(None).only('value', 'data_type').get(key=key)
             value = setting.get_typed_value()
             
             # تخزين القيمة في ذاكرة التخزين المؤقت
@@ -153,6 +227,49 @@ class SettingsManager:
         except SystemSetting.DoesNotExist:
             return default
     
+    @staticmethod
+    def get_settings(keys, default=None, use_cache=True):
+        """
+        الحصول على قيم عدة إعدادات دفعة واحدة
+        
+        يتم استخدام قراءة واحدة من ذاكرة التخزين المؤقت واستعلام واحد
+        للإعدادات غير المخزنة بدلاً من عملية لكل مفتاح.
+        
+        :param keys: قائمة بمفاتيح الإعدادات
+        :param default: القيمة الافتراضية للإعدادات غير الموجودة
+        :param use_cache: استخدام ذاكرة التخزين المؤقت
+        :return: قاموس {المفتاح: القيمة}
+        """
+        epoch = _settings_epoch()
+        cache_keys = {key: f"system_setting_{epoch}_{key}" for key in keys}
+        result = {}
+        
+        if use_cache:
+            hits = cache.get_many(list(cache_keys.values()))
+            for key, cache_key in cache_keys.items():
+                if hits.get(cache_key) is not None:
+                    result[key] = hits[cache_key]
+        
+        missing = [key for key in cache_keys if key not in result]
+        
+        if missing:
+            typed = {
+                setting.key: setting.get_typed_value()
+                for setting in SystemSetting.objects.filter(key__in=missing).select_related(None).only('key', 'value', 'data_type')
+            }
+            
+            # تخزين القيم في ذاكرة التخزين المؤقت
+            if use_cache and typed:
+                cache.set_many(
+                    {cache_keys[key]: value for key, value in typed.items()},
+                    timeout=3600  # تخزين لمدة ساعة
+                )
+            
+            for key in missing:
+                result[key] = typed.get(key, default)
+        
+        return result
+    
     @staticmethod
     def set_setting(key, value, data_type=None, setting_type='general', description=None, is_public=False, updated_by=None):
         """
@@ -179,28 +296,31 @@ class SettingsManager:
                 data_type = 'boolean'
             elif isinstance(value, dict) or isinstance(value, list):
                 data_type = 'json'
-                value = json.dumps(value)
+                value = _json_dumps(value)
             else:
                 data_type = 'string'
                 value = str(value)
         
+        defaults = {
+            'value': value,
+            'data_type': data_type,
+            'setting_type': setting_type,
+            'is_public': is_public,
+            'updated_by': updated_by
+        }
+        
+        # الوصف يُعيَّن فقط عند إنشاء الإعداد، ضمن نفس عملية الإدراج
+        create_defaults = dict(defaults)
+        if description:
+            create_defaults['description'] = description
+        
         # التحقق مما إذا كان الإعداد موجودًا بالفعل
         setting, created = SystemSetting.objects.update_or_create(
             key=key,
-            defaults={
-                'value': value,
-                'data_type': data_type,
-                'setting_type': setting_type,
-                'is_public': is_public,
-                'updated_by': updated_by
-            }
+            defaults=defaults,
+            create_defaults=create_defaults
         )
         
-        # تحديث الوصف إذا تم تحديده وكان الإعداد جديدًا
-        if description and created:
-            setting.description = description
-            setting.save(update_fields=['description'])
-        
         return setting
     
     @staticmethod
@@ -213,17 +333,9 @@ class SettingsManager:
         """
         try:
             setting = SystemSetting.objects.get(key=key)
-            setting_type = setting.setting_type
+            # ذاكرة التخزين المؤقت تُبطل عبر إشارة post_delete
             setting.delete()
             
-            # إزالة ذاكرة التخزين المؤقت
-            cache_key = f"system_setting_{key}"
-            cache.delete(cache_key)
-            
-            # إزالة ذاكرة التخزين المؤقت لنوع الإعداد
-            cache_key = f"system_settings_{setting_type}"
-            cache.delete(cache_key)
-            
             return True
         except SystemSetting.DoesNotExist:
             return False
@@ -238,15 +350,12 @@ class SettingsManager:
         :param use_cache: استخدام ذاكرة التخزين المؤقت
         :return: قاموس بالإعدادات
         """
-        # التحقق من ذاكرة التخزين المؤقت
-        cache_key = f"system_settings_{setting_type}"
+        # التحقق من ذاكرة التخزين المؤقت (مفتاح مستقل للإعدادات العامة)
+        cache_key = f"system_settings_{_settings_epoch()}_{setting_type}_{'public' if public_only else 'all'}"
         
         if use_cache:
             cached_value = cache.get(cache_key)
             if cached_value is not None:
-                # إذا كان public_only صحيحًا، قم بتصفية النتائج
-                if public_only:
-                    return {k: v for k, v in cached_value.items() if k.startswith('public_')}
                 return cached_value
         
         query = models.Q(setting_type=setting_type)
@@ -254,7 +363,7 @@ class SettingsManager:
         if public_only:
             query &= models.Q(is_public=True)
         
-        settings_list = SystemSetting.objects.filter(query)
+        settings_list = SystemSetting.objects.filter(query).select_related(None).only('key', 'value', 'data_type')
         
         result = {}
         for setting in settings_list:
@@ -267,16 +376,47 @@ class SettingsManager:
         return result
     
     @staticmethod
-    def get_all_settings(public_only=False):
+    def get_settings_all_by_type(public_only=False):
+        """
+        الحصول على جميع الإعدادات مقسمة حسب النوع باستعلام واحد (بدون ذاكرة مؤقتة)
+        
+        يتم جلب الأعمدة اللازمة فقط كقيم دون إنشاء كائنات النموذج.
+        
+        :param public_only: ما إذا كان يجب إرجاع الإعدادات العامة فقط
+        :return: قاموس بالإعدادات مقسمة حسب النوع
+        """
+        rows = SystemSetting.objects.values_list('setting_type', 'key', 'value', 'data_type')
+        
+        if public_only:
+            rows = rows.filter(is_public=True)
+        
+        result = {setting_type: {} for setting_type, _ in SystemSetting.SETTING_TYPES}
+        for setting_type, key, value, data_type in rows:
+            result.setdefault(setting_type, {})[key] = _parse_value(data_type, value)
+        
+        return result
+    
+    @staticmethod
+    def get_all_settings(public_only=False, use_cache=True):
         """
         الحصول على جميع الإعدادات
         
         :param public_only: ما إذا كان يجب إرجاع الإعدادات العامة فقط
+        :param use_cache: استخدام ذاكرة التخزين المؤقت
         :return: قاموس بالإعدادات مقسمة حسب النوع
         """
-        result = {}
+        # التحقق من ذاكرة التخزين المؤقت
+        cache_key = f"system_settings_{_settings_epoch()}_{'all_public' if public_only else 'all'}"
+        
+        if use_cache:
+            cached_value = cache.get(cache_key)
+            if cached_value is not None:
+                return cached_value
+        
+        result = SettingsManager.get_settings_all_by_type(public_only)
         
-        for setting_type, _ in SystemSetting.SETTING_TYPES:
-            result[setting_type] = SettingsManager.get_settings_by_type(setting_type, public_only)
+        # تخزين النتيجة في ذاكرة التخزين المؤقت
+        if use_cache:
+            cache.set(cache_key, result, timeout=3600)  # تخزين لمدة ساعة
         
         return result
@@ -2,13 +2,19 @@
 نظام إدارة سير العمل (Workflow) باستخدام نظام Django المدمج
 """
 
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, transaction
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.conf import settings
-from django.core.exceptions import PermissionDenied
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.views import redirect_to_login
+from functools import wraps
 
 from .audit import AuditLogManager
 
@@ -51,6 +57,10 @@ class WorkflowState(models.Model):
         verbose_name_plural = _('Workflow States')
         unique_together = ('content_type', 'code')
         ordering = ['content_type', 'order', 'name']
+        indexes = [
+            models.Index(fields=['content_type', 'is_initial'], name='wf_state_initial_idx'),
+            models.Index(fields=['content_type', 'is_final'], name='wf_state_final_idx'),
+        ]
     
     def __str__(self):
         return f"{self.content_type.model}: {self.name} ({self.code})"
@@ -111,10 +121,27 @@ class WorkflowTransition(models.Model):
         verbose_name_plural = _('Workflow Transitions')
         unique_together = ('content_type', 'source_state', 'target_state')
         ordering = ['content_type', 'source_state', 'target_state']
+        indexes = [
+            models.Index(fields=['is_automatic'], name='wf_transition_automatic_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name}: {self.source_state.name} → {self.target_state.name}"
     
+    @cached_property
+    def compiled_condition(self):
+        """
+        شروط الانتقال التلقائي محولة إلى كائن Q (يتم التحويل مرة واحدة لكل كائن)
+        """
+        return _conditions_to_q(self.conditions)
+    
+    @cached_property
+    def full_permission(self):
+        """
+        اسم الصلاحية الكامل المطلوب لهذا الانتقال (app_label.codename)
+        """
+        return f"{self.content_type.app_label}.{self.permission_codename}"
+    
     def has_permission(self, user):
         """
         التحقق مما إذا كان المستخدم لديه صلاحية لهذا الانتقال
@@ -122,8 +149,7 @@ class WorkflowTransition(models.Model):
         if user.is_superuser:
             return True
         
-        app_label = self.content_type.app_label
-        return user.has_perm(f"{app_label}.{self.permission_codename}")
+        return user.has_perm(self.full_permission)
 
 
 class WorkflowLog(models.Model):
@@ -181,11 +207,159 @@ class WorkflowLog(models.Model):
         verbose_name = _('Workflow Log')
         verbose_name_plural = _('Workflow Logs')
         ordering = ['-performed_at']
+        indexes = [
+            models.Index(
+                fields=['content_type', 'object_id', '-performed_at'],
+                name='wf_log_object_history_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.content_type.model} ({self.object_id}): {self.from_state.name} → {self.to_state.name}"
 
 
+# أعمدة نصية لا تحتاجها عمليات البحث في الانتقالات
+_TRANSITION_DEFERRED_FIELDS = (
+    'description',
+    'source_state__description',
+    'target_state__description',
+)
+
+
+# حجم دفعة معالجة الانتقالات التلقائية
+AUTOMATIC_TRANSITION_CHUNK_SIZE = 1000
+
+
+# مدة صلاحية حالات وانتقالات سير العمل في الذاكرة المؤقتة المشتركة (بالثواني)؛
+# يتم مسحها أيضاً عند تعديلها (انظر clear_workflow_cache)
+WORKFLOW_CACHE_TIMEOUT = 300
+
+# الأعمدة المخزنة لكل حالة وانتقال (بدون أعمدة الوصف النصية)
+_STATE_CACHE_FIELDS = ('id', 'content_type_id', 'name', 'code', 'is_initial', 'is_final', 'order', 'created_at')
+_TRANSITION_CACHE_FIELDS = (
+    'id', 'content_type_id', 'name', 'source_state_id', 'target_state_id',
+    'permission_codename', 'is_automatic', 'conditions', 'created_at',
+)
+
+
+def _workflow_cache_key(content_type_id):
+    return f'workflow:{content_type_id}'
+
+
+def _workflow_rows(content_type_id):
+    """
+    صفوف حالات وانتقالات سير العمل لنوع محتوى من الذاكرة المؤقتة المشتركة
+    
+    الذاكرة مشتركة بين جميع العمليات (gunicorn وCelery)، لذلك يظهر مسحها عند
+    تعديل الحالات أو الانتقالات في جميع العمليات مباشرة. يتم تخزين قيم بسيطة
+    فقط وليس كائنات النماذج.
+    
+    :param content_type_id: معرف نوع المحتوى
+    :return: (صفوف الحالات، صفوف الانتقالات)
+    """
+    key = _workflow_cache_key(content_type_id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = (
+            list(WorkflowState.objects.filter(
+                content_type_id=content_type_id
+            ).values_list(*_STATE_CACHE_FIELDS)),
+            list(WorkflowTransition.objects.filter(
+                content_type_id=content_type_id
+            ).values_list(*_TRANSITION_CACHE_FIELDS)),
+        )
+        cache.set(key, rows, WORKFLOW_CACHE_TIMEOUT)
+    return rows
+
+
+def _build_states(state_rows):
+    """كائنات حالات جديدة من الصفوف المخزنة (نسخة مستقلة لكل استدعاء)"""
+    return [
+        WorkflowState.from_db(DEFAULT_DB_ALIAS, _STATE_CACHE_FIELDS, row)
+        for row in state_rows
+    ]
+
+
+def _states_by_code(content_type_id):
+    """
+    حالات سير العمل لنوع محتوى مفهرسة بالرمز
+    
+    :param content_type_id: معرف نوع المحتوى
+    :return: قاموس {الرمز: WorkflowState}
+    """
+    state_rows, _transition_rows = _workflow_rows(content_type_id)
+    return {state.code: state for state in _build_states(state_rows)}
+
+
+def _transitions_map(content_type_id):
+    """
+    انتقالات سير العمل لنوع محتوى مفهرسة برمزي الحالتين
+    
+    :param content_type_id: معرف نوع المحتوى
+    :return: قاموس {(رمز الحالة المصدر، رمز الحالة الهدف): WorkflowTransition}
+    """
+    state_rows, transition_rows = _workflow_rows(content_type_id)
+    states = {state.pk: state for state in _build_states(state_rows)}
+    content_type = ContentType.objects.get_for_id(content_type_id)
+    
+    transitions = {}
+    for row in transition_rows:
+        transition = WorkflowTransition.from_db(DEFAULT_DB_ALIAS, _TRANSITION_CACHE_FIELDS, row)
+        source_state = states.get(transition.source_state_id)
+        target_state = states.get(transition.target_state_id)
+        if source_state is None or target_state is None:
+            continue
+        transition.content_type = content_type
+        transition.source_state = source_state
+        transition.target_state = target_state
+        transitions[(source_state.code, target_state.code)] = transition
+    return transitions
+
+
+# أنواع شروط الانتقالات التلقائية وما يقابلها في استعلامات Django
+_CONDITION_LOOKUPS = {
+    'equals': 'exact',
+    'greater_than': 'gt',
+    'less_than': 'lt',
+}
+
+
+def _conditions_to_q(conditions):
+    """
+    تحويل شروط الانتقال التلقائي (JSON) إلى كائن Q لتنفيذها في قاعدة البيانات
+    
+    :param conditions: قاموس {الحقل: {'type': ..., 'value': ...}}
+    :return: كائن Q (فارغ إذا لم توجد شروط)
+    """
+    query = models.Q()
+    
+    for field, condition in (conditions or {}).items():
+        condition_type = condition.get('type')
+        value = condition.get('value')
+        
+        if condition_type == 'not_equals':
+            query &= ~models.Q(**{field: value})
+        elif condition_type in _CONDITION_LOOKUPS:
+            query &= models.Q(**{f"{field}__{_CONDITION_LOOKUPS[condition_type]}": value})
+        # يتم تجاهل أنواع الشروط غير المعروفة
+    
+    return query
+
+
+@receiver(post_save, sender=WorkflowState)
+@receiver(post_delete, sender=WorkflowState)
+@receiver(post_save, sender=WorkflowTransition)
+@receiver(post_delete, sender=WorkflowTransition)
+def clear_workflow_cache(sender, instance, **kwargs):
+    """
+    مسح ذاكرة حالات وانتقالات سير العمل لنوع المحتوى عند تعديلها (في جميع العمليات)
+    """
+    key = _workflow_cache_key(instance.content_type_id)
+    cache.delete(key)
+    # مسح مرة أخرى بعد تأكيد المعاملة حتى لا تبقى قيم قديمة أعادت عملية أخرى تخزينها قبل التأكيد
+    transaction.on_commit(lambda: cache.delete(key))
+
+
 class WorkflowManager:
     """
     مدير سير العمل
@@ -209,10 +383,10 @@ class WorkflowManager:
         :param content_type: نوع المحتوى
         :return: حالة سير العمل الأولية
         """
-        try:
-            return WorkflowState.objects.get(content_type=content_type, is_initial=True)
-        except WorkflowState.DoesNotExist:
-            return None
+        for state in _states_by_code(content_type.pk).values():
+            if state.is_initial:
+                return state
+        return None
     
     @staticmethod
     def get_available_transitions(obj, user=None):
@@ -231,59 +405,108 @@ class WorkflowManager:
         if not current_state_code:
             return []
         
-        try:
-            current_state = WorkflowState.objects.get(content_type=content_type, code=current_state_code)
-        except WorkflowState.DoesNotExist:
+        current_state = _states_by_code(content_type.pk).get(current_state_code)
+        
+        if current_state is None:
             return []
         
         # الحصول على الانتقالات من الحالة الحالية
         transitions = WorkflowTransition.objects.filter(
             content_type=content_type,
             source_state=current_state
-        )
+        ).select_related(
+            'content_type', 'source_state', 'target_state'
+        ).defer(*_TRANSITION_DEFERRED_FIELDS)
         
         # إذا تم تحديد المستخدم، تحقق من الصلاحيات
         if user:
-            return [t for t in transitions if t.has_permission(user)]
+            return WorkflowManager.filter_permitted(transitions, user)
         
         return transitions
     
     @staticmethod
-    def can_transition(obj, target_state_code, user):
+    def filter_permitted(transitions, user):
         """
-        التحقق مما إذا كان يمكن الانتقال إلى حالة معينة
+        تصفية الانتقالات التي يملك المستخدم صلاحيتها
         
-        :param obj: الكائن
-        :param target_state_code: رمز الحالة الهدف
+        يتم جلب صلاحيات المستخدم مرة واحدة (يخزنها ModelBackend على كائن المستخدم)
+        ثم التحقق من كل انتقال في الذاكرة.
+        
+        :param transitions: الانتقالات
         :param user: المستخدم
-        :return: True إذا كان يمكن الانتقال، False إذا لم يكن
+        :return: قائمة بالانتقالات المسموح بها
         """
-        content_type = ContentType.objects.get_for_model(obj.__class__)
+        if user.is_superuser:
+            return list(transitions)
+        
+        perms = user.get_all_permissions()
+        return [t for t in transitions if t.full_permission in perms]
+    
+    @staticmethod
+    def _resolve_transition(obj, target_state_code):
+        """
+        تحديد الحالة الحالية والحالة الهدف والانتقال المناسب للكائن
         
+        يتم تخزين النتيجة على الكائن حتى لا تتكرر عند استدعاء can_transition
+        ثم transition لنفس الكائن.
+        
+        :param obj: الكائن
+        :param target_state_code: رمز الحالة الهدف
+        :return: (الحالة الحالية، الحالة الهدف، الانتقال) أو None
+        """
         # الحصول على الحالة الحالية للكائن
         current_state_code = getattr(obj, 'status', None)
         
         if not current_state_code:
-            return False
+            return None
         
-        try:
-            current_state = WorkflowState.objects.get(content_type=content_type, code=current_state_code)
-            target_state = WorkflowState.objects.get(content_type=content_type, code=target_state_code)
-        except WorkflowState.DoesNotExist:
-            return False
+        resolved_cache = obj.__dict__.setdefault('_resolved_transitions', {})
+        cache_key = (current_state_code, target_state_code)
+        if cache_key in resolved_cache:
+            return resolved_cache[cache_key]
         
-        # البحث عن الانتقال المناسب
-        try:
-            transition = WorkflowTransition.objects.get(
-                content_type=content_type,
-                source_state=current_state,
-                target_state=target_state
-            )
-        except WorkflowTransition.DoesNotExist:
+        # البحث عن الانتقال المناسب مباشرة برمزي الحالتين
+        content_type = ContentType.objects.get_for_model(obj.__class__)
+        transition = _transitions_map(content_type.pk).get(cache_key)
+        
+        resolved = None
+        if transition is not None:
+            resolved = (transition.source_state, transition.target_state, transition)
+        
+        resolved_cache[cache_key] = resolved
+        return resolved
+    
+    @staticmethod
+    def _has_transition_permission(transition, user):
+        """
+        التحقق من صلاحية المستخدم للانتقال مع تخزين النتيجة على كائن المستخدم
+        
+        :param transition: الانتقال
+        :param user: المستخدم
+        :return: True إذا كان لديه الصلاحية، False إذا لم يكن
+        """
+        perm_cache = user.__dict__.setdefault('_workflow_transition_perms', {})
+        if transition.pk not in perm_cache:
+            perm_cache[transition.pk] = transition.has_permission(user)
+        return perm_cache[transition.pk]
+    
+    @staticmethod
+    def can_transition(obj, target_state_code, user):
+        """
+        التحقق مما إذا كان يمكن الانتقال إلى حالة معينة
+        
+        :param obj: الكائن
+        :param target_state_code: رمز الحالة الهدف
+        :param user: المستخدم
+        :return: True إذا كان يمكن الانتقال، False إذا لم يكن
+        """
+        resolved = WorkflowManager._resolve_transition(obj, target_state_code)
+        
+        if resolved is None:
             return False
         
         # التحقق من صلاحيات المستخدم
-        return transition.has_permission(user)
+        return WorkflowManager._has_transition_permission(resolved[2], user)
     
     @staticmethod
     def transition(obj, target_state_code, user, comments=None):
@@ -296,57 +519,50 @@ class WorkflowManager:
         :param comments: تعليقات (اختياري)
         :return: True إذا تم الانتقال بنجاح، False إذا لم يكن
         """
-        content_type = ContentType.objects.get_for_model(obj.__class__)
-        
-        # الحصول على الحالة الحالية للكائن
-        current_state_code = getattr(obj, 'status', None)
+        resolved = WorkflowManager._resolve_transition(obj, target_state_code)
         
-        if not current_state_code:
+        if resolved is None:
             return False
         
-        try:
-            current_state = WorkflowState.objects.get(content_type=content_type, code=current_state_code)
-            target_state = WorkflowState.objects.get(content_type=content_type, code=target_state_code)
-        except WorkflowState.DoesNotExist:
-            return False
-        
-        # البحث عن الانتقال المناسب
-        try:
-            transition = WorkflowTransition.objects.get(
-                content_type=content_type,
-                source_state=current_state,
-                target_state=target_state
-            )
-        except WorkflowTransition.DoesNotExist:
-            return False
+        current_state, target_state, transition = resolved
+        content_type = transition.content_type
         
-        # التحقق من صلاحيات المستخدم
-        if not transition.has_permission(user):
+        # التحقق من صلاحيات المستخدم (يعاد استخدام نتيجة can_transition إن وجدت)
+        if not WorkflowManager._has_transition_permission(transition, user):
             raise PermissionDenied("You do not have permission to perform this transition.")
         
-        # تغيير الحالة
-        setattr(obj, 'status', target_state_code)
-        obj.save()
-        
-        # تسجيل الانتقال
-        WorkflowLog.objects.create(
-            content_type=content_type,
-            object_id=obj.pk,
-            transition=transition,
-            from_state=current_state,
-            to_state=target_state,
-            performed_by=user,
-            comments=comments,
-            is_automatic=False
-        )
-        
-        # تسجيل الانتقال في سجل التدقيق
-        AuditLogManager.log_change(
-            user=user,
-            obj=obj,
-            message=f"Changed status from {current_state.name} to {target_state.name}",
-            changed_data={'status': target_state_code}
-        )
+        with transaction.atomic():
+            # تغيير الحالة بتحديث مشروط بالحالة الحالية، فإذا سبقنا طلب آخر
+            # إلى تغييرها لن يتم تحديث أي صف
+            updated = type(obj).objects.filter(
+                pk=obj.pk,
+                status=current_state.code
+            ).update(status=target_state_code)
+            
+            if updated != 1:
+                return False
+            
+            setattr(obj, 'status', target_state_code)
+            
+            # تسجيل الانتقال
+            WorkflowLog.objects.create(
+                content_type=content_type,
+                object_id=obj.pk,
+                transition=transition,
+                from_state=current_state,
+                to_state=target_state,
+                performed_by=user,
+                comments=comments,
+                is_automatic=False
+            )
+            
+            # تسجيل الانتقال في سجل التدقيق
+            AuditLogManager.log_change(
+                user=user,
+                obj=obj,
+                message=f"Changed status from {current_state.name} to {target_state.name}",
+                changed_data={'status': target_state_code}
+            )
         
         return True
     
@@ -362,67 +578,107 @@ class WorkflowManager:
         return WorkflowLog.objects.filter(
             content_type=content_type,
             object_id=obj.pk
+        ).select_related(
+            'from_state', 'to_state', 'transition', 'performed_by', 'content_type'
         ).order_by('-performed_at')
     
     @staticmethod
-    def check_automatic_transitions():
+    def get_workflow_history_bulk(objs):
+        """
+        الحصول على سجل سير العمل لعدة كائنات (استعلام واحد لكل نوع محتوى)
+        
+        :param objs: قائمة بالكائنات
+        :return: قاموس {(معرف نوع المحتوى، معرف الكائن): قائمة بسجلات سير العمل}
+        """
+        # تجميع معرفات الكائنات حسب نوع المحتوى
+        ids_by_content_type = {}
+        for obj in objs:
+            content_type = ContentType.objects.get_for_model(obj.__class__)
+            ids_by_content_type.setdefault(content_type.pk, []).append(str(obj.pk))
+        
+        history = {}
+        for content_type_id, object_ids in ids_by_content_type.items():
+            logs = WorkflowLog.objects.filter(
+                content_type_id=content_type_id,
+                object_id__in=object_ids
+            ).select_related(
+                'from_state', 'to_state', 'transition', 'performed_by', 'content_type'
+            ).prefetch_related('content_object').order_by('-performed_at')
+            
+            for log in logs:
+                history.setdefault((content_type_id, log.object_id), []).append(log)
+        
+        return history
+    
+    @staticmethod
+    def check_automatic_transitions(chunk_size=AUTOMATIC_TRANSITION_CHUNK_SIZE):
         """
         التحقق من الانتقالات التلقائية
         
+        تتم معالجة الكائنات على دفعات حتى لا يتم تحميل جميع المعرفات في الذاكرة.
+        
+        :param chunk_size: حجم الدفعة (اختياري)
         :return: عدد الانتقالات التي تم تنفيذها
         """
         # الحصول على جميع الانتقالات التلقائية
-        automatic_transitions = WorkflowTransition.objects.filter(is_automatic=True)
+        automatic_transitions = WorkflowTransition.objects.filter(
+            is_automatic=True
+        ).select_related('content_type', 'source_state', 'target_state').iterator()
         
         count = 0
         
         for transition in automatic_transitions:
-            content_type = transition.content_type
-            model = content_type.model_class()
+            model = transition.content_type.model_class()
+            
+            # الحصول على الكائنات في الحالة المصدر التي تحقق الشروط (التصفية في قاعدة البيانات)
+            object_ids = (
+                model.objects.filter(status=transition.source_state.code)
+                .filter(transition.compiled_condition)
+                .values_list('pk', flat=True)
+                .iterator(chunk_size=chunk_size)
+            )
+            
+            chunk = []
+            for object_id in object_ids:
+                chunk.append(object_id)
+                if len(chunk) >= chunk_size:
+                    count += WorkflowManager._apply_automatic_transition(transition, model, chunk)
+                    chunk = []
+            
+            if chunk:
+                count += WorkflowManager._apply_automatic_transition(transition, model, chunk)
+        
+        return count
+    
+    @staticmethod
+    def _apply_automatic_transition(transition, model, object_ids):
+        """
+        تنفيذ انتقال تلقائي على دفعة من الكائنات
+        
+        :param transition: الانتقال
+        :param model: نموذج الكائنات
+        :param object_ids: معرفات الكائنات
+        :return: عدد الكائنات التي تم نقلها فعلاً
+        """
+        with transaction.atomic():
+            # قفل الكائنات التي ما زالت في الحالة المصدر فقط (قد تتغير حالة بعضها
+            # بعد جلب المعرفات) حتى لا يتم تسجيل أو احتساب انتقالات لم تحدث
+            object_ids = list(
+                model.objects.select_for_update()
+                .filter(pk__in=object_ids, status=transition.source_state.code)
+                .values_list('pk', flat=True)
+            )
+            if not object_ids:
+                return 0
             
-            # الحصول على الكائنات في الحالة المصدر
-            source_state_code = transition.source_state.code
-            objects = model.objects.filter(status=source_state_code)
+            # تنفيذ الانتقال بعملية تحديث واحدة
+            model.objects.filter(pk__in=object_ids).update(status=transition.target_state.code)
             
-            for obj in objects:
-                # التحقق من الشروط
-                if transition.conditions:
-                    # تنفيذ الشروط (يمكن تحسين هذا)
-                    conditions_met = True
-                    
-                    for field, condition in transition.conditions.items():
-                        field_value = getattr(obj, field, None)
-                        
-                        if condition.get('type') == 'equals':
-                            if field_value != condition.get('value'):
-                                conditions_met = False
-                                break
-                        elif condition.get('type') == 'not_equals':
-                            if field_value == condition.get('value'):
-                                conditions_met = False
-                                break
-                        elif condition.get('type') == 'greater_than':
-                            if field_value <= condition.get('value'):
-                                conditions_met = False
-                                break
-                        elif condition.get('type') == 'less_than':
-                            if field_value >= condition.get('value'):
-                                conditions_met = False
-                                break
-                        # يمكن إضافة المزيد من أنواع الشروط
-                    
-                    if not conditions_met:
-                        continue
-                
-                # تنفيذ الانتقال
-                target_state_code = transition.target_state.code
-                setattr(obj, 'status', target_state_code)
-                obj.save()
-                
-                # تسجيل الانتقال
-                WorkflowLog.objects.create(
-                    content_type=content_type,
-                    object_id=obj.pk,
+            # تسجيل الانتقالات بعملية إدراج واحدة
+            WorkflowLog.objects.bulk_create([
+                WorkflowLog(
+                    content_type=transition.content_type,
+                    object_id=object_id,
                     transition=transition,
                     from_state=transition.source_state,
                     to_state=transition.target_state,
@@ -430,66 +686,64 @@ class WorkflowManager:
                     comments="Automatic transition",
                     is_automatic=True
                 )
-                
-                count += 1
+                for object_id in object_ids
+            ])
         
-        return count
+        return len(object_ids)
 
 
 # زخارف للتحقق من صلاحيات سير العمل
 
-def workflow_transition_required(target_state_code, login_url=None, raise_exception=True):
+def workflow_transition_required(target_state_code, model=None, login_url=None, raise_exception=True):
     """
     زخرفة للتحقق من صلاحيات انتقال سير العمل
     
+    يتم تحديد النموذج مرة واحدة عند تطبيق الزخرفة (من المعامل model أو من
+    خاصية model في العرض) بدلاً من تحليل عنوان الطلب في كل طلب.
+    
     :param target_state_code: رمز الحالة الهدف
+    :param model: نموذج الكائن (اختياري، يؤخذ من العرض إذا لم يحدد)
     :param login_url: عنوان URL لتسجيل الدخول (اختياري)
     :param raise_exception: ما إذا كان يجب رفع استثناء PermissionDenied (اختياري)
     """
-    from django.contrib.auth.decorators import user_passes_test
-    
-    def check_transition_permission(user):
-        if not user.is_authenticated:
-            return False
-        
-        if user.is_superuser:
-            return True
-        
-        # الحصول على الكائن من العرض
-        from django.urls import resolve
-        from django.http import Http404
+    def decorator(view_func):
+        # تحديد النموذج مرة واحدة عند تطبيق الزخرفة
+        view_model = (
+            model
+            or getattr(view_func, 'model', None)
+            or getattr(getattr(view_func, 'view_class', None), 'model', None)
+        )
         
-        request = getattr(user, '_request', None)
+        def deny(request):
+            if raise_exception and request.user.is_authenticated:
+                raise PermissionDenied("You do not have permission to perform this transition.")
+            return redirect_to_login(request.get_full_path(), login_url)
         
-        if not request:
-            return False
-        
-        try:
-            resolver_match = resolve(request.path)
-            view_kwargs = resolver_match.kwargs
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            user = request.user
             
-            # الحصول على الكائن
-            model = None
-            obj = None
+            if not user.is_authenticated:
+                return deny(request)
             
-            # محاولة الحصول على الكائن من المعرف
-            if 'pk' in view_kwargs:
-                # الحصول على النموذج من العرض
-                view_func = resolver_match.func
-                model = getattr(view_func, 'model', None)
-                
-                if model:
-                    try:
-                        obj = model.objects.get(pk=view_kwargs['pk'])
-                    except model.DoesNotExist:
-                        raise Http404("Object not found")
+            if user.is_superuser:
+                return view_func(request, *args, **kwargs)
             
-            if not obj:
-                return False
+            # الحصول على الكائن من معاملات العرض
+            if view_model is None or 'pk' not in kwargs:
+                return deny(request)
+            
+            try:
+                obj = view_model.objects.get(pk=kwargs['pk'])
+            except (view_model.DoesNotExist, ValueError, ValidationError):
+                return deny(request)
             
             # التحقق من صلاحيات الانتقال
-            return WorkflowManager.can_transition(obj, target_state_code, user)
-        except:
-            return False
+            if not WorkflowManager.can_transition(obj, target_state_code, user):
+                return deny(request)
+            
+            return view_func(request, *args, **kwargs)
+        
+        return _wrapped_view
     
-    return user_passes_test(check_transition_permission, login_url=login_url, raise_exception=raise_exception)
+    return decorator
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class DepartmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'departments'
+    name = 'apps.departments'
+    
+    def ready(self):
+        # إشارات تحديث الساعات المعتمدة والإحصائيات ومسح الذاكرة المؤقتة
+        import apps.departments.signals
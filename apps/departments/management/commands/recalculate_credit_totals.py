@@ -0,0 +1,29 @@
+"""
+إعادة حساب الساعات المعتمدة المخزنة مسبقاً من مقررات الخطط الفصلية
+
+تستخدم لإصلاح القيم بعد تعديل المقررات أو الخطط الفصلية بعمليات جماعية
+(bulk_create / update) لا ترسل إشارات الحفظ.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.departments.models import AcademicLevel, StudyPlan
+from apps.departments.signals import recalculate_level_credits, recalculate_plan_credits
+
+
+class Command(BaseCommand):
+    help = "Recalculate StudyPlan.scheduled_credit_hours and AcademicLevel.total_credits from semester plan courses"
+
+    def handle(self, *args, **options):
+        study_plan_ids = list(StudyPlan.objects.values_list('pk', flat=True))
+        for study_plan_id in study_plan_ids:
+            recalculate_plan_credits(study_plan_id)
+
+        academic_level_ids = list(AcademicLevel.objects.values_list('pk', flat=True))
+        for academic_level_id in academic_level_ids:
+            recalculate_level_credits(academic_level_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recalculated credit totals for {len(study_plan_ids)} study plans "
+            f"and {len(academic_level_ids)} academic levels"
+        ))
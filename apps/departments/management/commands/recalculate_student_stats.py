@@ -0,0 +1,47 @@
+"""
+إعادة حساب إحصائيات الطلاب الأكاديمية (StudentAcademicStats) من درجاتهم
+
+تستخدم لتعبئة الجدول لأول مرة، ولإصلاحه بعد إدراج أو تعديل الدرجات بعمليات
+جماعية (bulk_create / update) لا ترسل إشارات الحفظ.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.departments.models import StudentAcademicStats
+
+
+class Command(BaseCommand):
+    help = "Recalculate StudentAcademicStats for students from their grades"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student',
+            type=int,
+            action='append',
+            dest='student_ids',
+            help="Only recalculate the given student id (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        from apps.academic.models import StudentGrade
+
+        # أزواج (الطالب، البرنامج) التي لدى الطالب فيها درجات مرصودة
+        pairs = StudentGrade.objects.filter(
+            course__program_courses__isnull=False
+        )
+        if options['student_ids']:
+            pairs = pairs.filter(student_id__in=options['student_ids'])
+        pairs = pairs.order_by('student_id').values_list(
+            'student_id', 'course__program_courses__program_id'
+        ).distinct()
+
+        programs_by_student = {}
+        for student_id, program_id in pairs.iterator():
+            programs_by_student.setdefault(student_id, []).append(program_id)
+
+        for student_id, program_ids in programs_by_student.items():
+            StudentAcademicStats.recalculate(student_id, program_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recalculated academic stats for {len(programs_by_student)} students"
+        ))
@@ -1,22 +1,41 @@
 #this app is for departments and their programs
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.text import slugify
+from django.utils.functional import cached_property
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Q, Count, Sum
+from django.db.models import F, Q, Sum, Prefetch, Subquery
 import re
 
 from apps.core.numbering import BaseNumberingSystem, DepartmentNumbering
 from .utils import (
-    generate_department_number,
     format_department_number,
     validate_department_number,
     get_unique_department_code,
+    pick_unique_department_code,
+    build_adjacency,
+    reachable_from,
     department_image_path
 )
 
+# تنسيق رمز المقرر (مثال: CS-101)
+_COURSE_CODE_RE = re.compile(r'^[A-Z]{2,4}-\d{3,4}$')
+
+class DepartmentManager(models.Manager):
+    """مدير الأقسام (يجلب رقم الكلية مع القسم لتنسيق رقم القسم دون استعلام إضافي)"""
+    
+    def get_queryset(self):
+        return super().get_queryset().annotate(_college_code=F('college__code'))
+    
+    def slim(self):
+        """الأقسام دون الحقول النصية الكبيرة (لعروض القوائم)"""
+        return self.get_queryset().defer('description', 'department_vision', 'department_message')
+
+
 # نموذج اقسام الكليات 
 class Department(models.Model):
     """نموذج القسم الأكاديمي أو الإداري"""
@@ -82,6 +101,8 @@ class Department(models.Model):
         verbose_name=_("Department Message")
     )
 
+    objects = DepartmentManager()
+
     class Meta:
         verbose_name = _("Department")
         verbose_name_plural = _("Departments")
@@ -94,9 +115,8 @@ class Department(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.dep_no:
-            self.dep_no = generate_department_number(
-                model_class=self.__class__,
-                college_id=self.college_id if self.college else None,
+            self.dep_no = DepartmentCounter.reserve(
+                college_id=self.college_id,
                 department_type=self.department_type
             )
         
@@ -110,6 +130,44 @@ class Department(models.Model):
         
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bulk_create_with_codes(cls, departments):
+        """
+        إنشاء عدة أقسام دفعة واحدة مع توليد الأرقام والاختصارات
+        
+        يتم جلب الاختصارات الموجودة مرة واحدة، وحجز الأرقام مرة واحدة لكل
+        (كلية، نوع قسم)، ثم إدراج الأقسام بعملية bulk_create واحدة.
+        
+        :param departments: الأقسام المراد إنشاؤها
+        :return: قائمة بالأقسام التي تم إنشاؤها
+        """
+        departments = list(departments)
+        existing_codes = set(cls.objects.values_list('code', flat=True))
+        
+        # حجز كتلة أرقام واحدة لكل (كلية، نوع قسم)
+        group_counts = {}
+        for department in departments:
+            if not department.dep_no:
+                group = (department.college_id, department.department_type)
+                group_counts[group] = group_counts.get(group, 0) + 1
+        
+        next_numbers = {
+            group: DepartmentCounter.reserve(*group, count=count)
+            for group, count in group_counts.items()
+        }
+        
+        for department in departments:
+            if not department.dep_no:
+                group = (department.college_id, department.department_type)
+                department.dep_no = next_numbers[group]
+                next_numbers[group] += 1
+            
+            if department.name and not department.code:
+                department.code = pick_unique_department_code(department.name, existing_codes)
+                existing_codes.add(department.code)
+        
+        return cls.objects.bulk_create(departments)
+
     def clean(self):
         """التحقق من صحة البيانات"""
         super().clean()
@@ -135,16 +193,107 @@ class Department(models.Model):
         """تنسيق رقم القسم"""
         if not self.dep_no:
             return ''
+        
+        # استخدام رقم الكلية المجلوب مع القسم إن وجد
+        if '_college_code' in self.__dict__:
+            college_code = self._college_code
+        else:
+            college_code = self.college.code if self.college_id else None
             
         return format_department_number(
             number=self.dep_no,
-            college_code=self.college.code if self.college else None,
+            college_code=college_code,
             department_type=self.department_type
         )
 
     def __str__(self):
         return f"{self.format_number()} - {self.name}"
 
+class DepartmentCounter(models.Model):
+    """عداد أرقام الأقسام لكل (كلية، نوع قسم)"""
+    
+    college = models.ForeignKey(
+        'university.College',
+        on_delete=models.CASCADE,
+        related_name='department_counters',
+        verbose_name=_("College"),
+        null=True,
+        blank=True
+    )
+    department_type = models.CharField(
+        max_length=20,
+        choices=Department.DEPARTMENT_TYPES,
+        verbose_name=_("Department Type")
+    )
+    last_number = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Last Number")
+    )
+
+    class Meta:
+        verbose_name = _("Department Counter")
+        verbose_name_plural = _("Department Counters")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['college', 'department_type'],
+                name='uniq_department_counter',
+                nulls_distinct=False
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.college_id or '-'} / {self.department_type}: {self.last_number}"
+
+    @classmethod
+    def reserve(cls, college_id, department_type, count=1):
+        """
+        حجز أرقام أقسام جديدة بشكل ذري
+        
+        يتم قفل صف العداد (select_for_update) حتى لا يحصل طلبان متزامنان على نفس
+        الرقم. عند إنشاء العداد لأول مرة يبدأ من أعلى رقم مستخدم في المجموعة.
+        
+        :param college_id: معرف الكلية (None للأقسام غير المرتبطة بكلية)
+        :param department_type: نوع القسم
+        :param count: عدد الأرقام المطلوب حجزها (اختياري)
+        :return: أول رقم محجوز
+        """
+        numbering_settings = DepartmentNumbering.get_settings()
+        
+        def current_max():
+            max_number = Department.objects.filter(
+                college_id=college_id,
+                department_type=department_type
+            ).aggregate(max_number=models.Max('dep_no'))['max_number']
+            return max_number if max_number is not None else numbering_settings['min_number'] - 1
+        
+        with transaction.atomic():
+            counter, _created = cls.objects.select_for_update().get_or_create(
+                college_id=college_id,
+                department_type=department_type,
+                defaults={'last_number': current_max}
+            )
+            
+            first_number = counter.last_number + 1
+            last_number = counter.last_number + count
+            if last_number > numbering_settings['max_number']:
+                raise ValidationError({
+                    'dep_no': _('Maximum number of departments has been reached')
+                })
+            
+            counter.last_number = last_number
+            counter.save(update_fields=['last_number'])
+        
+        return first_number
+
+
+class AcademicProgramManager(models.Manager):
+    """مدير البرامج الأكاديمية"""
+    
+    def slim(self):
+        """البرامج دون الحقول النصية الكبيرة (لعروض القوائم)"""
+        return self.get_queryset().defer('description', 'learning_outcomes', 'admission_requirements')
+
+
 class AcademicProgram(models.Model):
     """نموذج البرنامج الأكاديمي وفقاً لمعايير بولونيا"""
     
@@ -159,6 +308,10 @@ class AcademicProgram(models.Model):
         ('part_time', _('Part Time')),
         ('distance', _('Distance Learning')),
     ]
+    
+    # خرائط أسماء الخيارات (بحث مباشر بدلاً من المرور على قائمة الخيارات)
+    _DEGREE_LEVELS_MAP = dict(DEGREE_LEVELS)
+    _PROGRAM_TYPES_MAP = dict(PROGRAM_TYPES)
 
     code = models.CharField(
         max_length=10,
@@ -216,6 +369,8 @@ class AcademicProgram(models.Model):
         verbose_name=_("Active Status")
     )
 
+    objects = AcademicProgramManager()
+
     class Meta:
         verbose_name = _("Academic Program")
         verbose_name_plural = _("Academic Programs")
@@ -227,6 +382,28 @@ class AcademicProgram(models.Model):
 
     def __str__(self):
         return f"{self.code} - {self.name}"
+    
+    @property
+    def degree_level_display(self):
+        """اسم الدرجة العلمية"""
+        return self._DEGREE_LEVELS_MAP.get(self.degree_level, self.degree_level)
+    
+    @property
+    def program_type_display(self):
+        """اسم نوع البرنامج"""
+        return self._PROGRAM_TYPES_MAP.get(self.program_type, self.program_type)
+
+# حالات الشعب التي تجعل المقرر متاحاً في الفصل الدراسي
+AVAILABLE_SECTION_STATUSES = ('open', 'closed', 'in_progress')
+
+
+class CourseManager(models.Manager):
+    """مدير المقررات الدراسية"""
+    
+    def slim(self):
+        """المقررات دون الحقول النصية الكبيرة (لعروض القوائم)"""
+        return self.get_queryset().defer('description', 'learning_outcomes')
+
 
 class Course(models.Model):
     """نموذج المقرر الدراسي وفقاً لمعايير بولونيا"""
@@ -237,6 +414,9 @@ class Course(models.Model):
         ('optional', _('Optional')),
     ]
     
+    # خريطة أسماء أنواع المقررات (بحث مباشر بدلاً من المرور على قائمة الخيارات)
+    _COURSE_TYPES_MAP = dict(COURSE_TYPES)
+    
     COURSE_LEVELS = [
         ('introductory', _('Introductory')),
         ('intermediate', _('Intermediate')),
@@ -284,6 +464,12 @@ class Course(models.Model):
         default=0,
         validators=[MinValueValidator(0)]
     )
+    total_hours = models.GeneratedField(
+        expression=F('hours_lecture') + F('hours_lab') + F('hours_tutorial'),
+        output_field=models.PositiveIntegerField(),
+        db_persisted=True,
+        verbose_name=_("Total Hours")
+    )
     course_type = models.CharField(
         max_length=20,
         choices=COURSE_TYPES,
@@ -303,6 +489,8 @@ class Course(models.Model):
     )
     prerequisites = models.ManyToManyField(
         'self',
+        through='CoursePrerequisite',
+        through_fields=('from_course', 'to_course'),
         blank=True,
         symmetrical=False,
         related_name='prerequisite_for',
@@ -354,6 +542,8 @@ class Course(models.Model):
         verbose_name=_("Updated At")
     )
 
+    objects = CourseManager()
+
     class Meta:
         verbose_name = _("Course")
         verbose_name_plural = _("Courses")
@@ -363,22 +553,27 @@ class Course(models.Model):
             models.Index(fields=['course_type'], name='course_type_idx'),
             models.Index(fields=['course_level'], name='course_level_idx'),
             models.Index(fields=['department', 'is_active'], name='dept_active_idx'),
+            models.Index(fields=['total_hours'], name='course_total_hours_idx'),
         ]
 
     def __str__(self):
         return f"{self.code} - {self.name}"
     
+    @property
+    def course_type_display(self):
+        """اسم نوع المقرر"""
+        return self._COURSE_TYPES_MAP.get(self.course_type, self.course_type)
+    
     def clean(self):
         """التحقق من صحة بيانات المقرر"""
+        # ملاحظة: لا يستدعى تلقائياً عند الحفظ؛ يجب استدعاء full_clean() عند الحفظ خارج النماذج (forms)
         super().clean()
         
         # التحقق من تنسيق رمز المقرر (مثال: CS-101)
-        if self.code:
-            code_pattern = r'^[A-Z]{2,4}-\d{3,4}$'
-            if not re.match(code_pattern, self.code):
-                raise ValidationError({
-                    'code': _('Course code must be in format DEPT-NUM (e.g. CS-101)')
-                })
+        if self.code and not _COURSE_CODE_RE.match(self.code):
+            raise ValidationError({
+                'code': _('Course code must be in format DEPT-NUM (e.g. CS-101)')
+            })
         
         # التحقق من إجمالي ساعات المقرر
         total_hours = self.hours_lecture + self.hours_lab + self.hours_tutorial
@@ -394,53 +589,68 @@ class Course(models.Model):
                 'credits': _('Total hours are insufficient for the specified credits')
             })
     
-    def save(self, *args, **kwargs):
-        """حفظ المقرر مع التحقق من صحة البيانات"""
-        self.clean()
-        super().save(*args, **kwargs)
-    
     def get_total_hours(self):
         """حساب إجمالي ساعات المقرر"""
+        # استخدام القيمة المحسوبة في قاعدة البيانات إذا كانت محملة (لا تتوفر قبل الحفظ)
+        if 'total_hours' in self.__dict__:
+            return self.total_hours
         return self.hours_lecture + self.hours_lab + self.hours_tutorial
     
     def get_learning_outcomes_list(self):
         """الحصول على قائمة بنتائج التعلم"""
         if not self.learning_outcomes:
             return []
-        return [outcome.strip() for outcome in self.learning_outcomes.split('\n') if outcome.strip()]
+        return [outcome for outcome in map(str.strip, self.learning_outcomes.splitlines()) if outcome]
+    
+    @cached_property
+    def learning_outcomes_tuple(self):
+        """نتائج التعلم (مخزنة مؤقتاً على الكائن للعروض التي تستخدمها أكثر من مرة)"""
+        return tuple(self.get_learning_outcomes_list())
+    
+    @cached_property
+    def direct_prerequisites(self):
+        """المتطلبات السابقة المباشرة الفعالة (مخزنة مؤقتاً على الكائن)"""
+        return tuple(self.prerequisites.slim().filter(is_active=True))
     
     def get_all_prerequisites(self, include_indirect=False):
         """الحصول على جميع المتطلبات السابقة (المباشرة وغير المباشرة)"""
-        direct_prereqs = self.prerequisites.filter(is_active=True)
-        
         if not include_indirect:
-            return direct_prereqs
+            return list(self.direct_prerequisites)
         
         # الحصول على المتطلبات غير المباشرة (متطلبات المتطلبات)
-        all_prereqs = set(direct_prereqs)
-        for prereq in direct_prereqs:
-            all_prereqs.update(prereq.get_all_prerequisites(include_indirect=True))
+        # بحث بالعرض: استعلام واحد لكل مستوى بدلاً من استعلام لكل مقرر
+        all_prereqs = {}
+        frontier = list(self.direct_prerequisites)
+        while frontier:
+            for prereq in frontier:
+                all_prereqs[prereq.pk] = prereq
+            frontier = list(
+                Course.objects.filter(
+                    prerequisite_for__in=[prereq.pk for prereq in frontier],
+                    is_active=True
+                ).exclude(pk__in=all_prereqs.keys()).distinct()
+            )
+        
+        return set(all_prereqs.values())
+    
+    @classmethod
+    def prerequisite_graph(cls):
+        """
+        رسم المتطلبات السابقة لجميع المقررات (استعلام واحد)
+        
+        يستخدم مع دوال الرسوم في utils (reachable_from، topological_order)
+        في التحقق من الخطط والتقارير.
         
-        return all_prereqs
+        :return: قاموس {معرف المقرر: قائمة بمعرفات متطلباته السابقة}
+        """
+        return build_adjacency(
+            cls.prerequisites.through.objects.values_list('from_course_id', 'to_course_id')
+        )
     
     def check_circular_prerequisites(self):
         """التحقق من عدم وجود متطلبات دائرية"""
-        visited = set()
-        path = [self]
-        
-        def dfs(course):
-            visited.add(course.id)
-            for prereq in course.prerequisites.all():
-                if prereq.id == self.id:  # وجدنا دورة
-                    return True
-                if prereq.id not in visited:
-                    path.append(prereq)
-                    if dfs(prereq):
-                        return True
-                    path.pop()
-            return False
-        
-        return dfs(self)
+        # وجود دورة يعني أن المقرر يمكن الوصول إليه من متطلباته
+        return self.id in reachable_from(Course.prerequisite_graph(), self.id)
     
     def is_available_in_semester(self, semester):
         """التحقق مما إذا كان المقرر متاحًا في فصل دراسي معين"""
@@ -448,8 +658,122 @@ class Course(models.Model):
         return CourseSection.objects.filter(
             course=self,
             semester=semester,
-            status__in=['open', 'closed', 'in_progress']
+            status__in=AVAILABLE_SECTION_STATUSES
         ).exists()
+    
+    @classmethod
+    def available_course_ids_in_semester(cls, course_ids, semester):
+        """
+        الحصول على معرفات المقررات المتاحة في فصل دراسي معين (استعلام واحد)
+        
+        :param course_ids: معرفات المقررات
+        :param semester: الفصل الدراسي
+        :return: مجموعة بمعرفات المقررات المتاحة
+        """
+        from apps.academic.models import CourseSection
+        return set(
+            CourseSection.objects.filter(
+                course_id__in=course_ids,
+                semester=semester,
+                status__in=AVAILABLE_SECTION_STATUSES
+            ).values_list('course_id', flat=True).distinct()
+        )
+
+class CoursePrerequisite(models.Model):
+    """نموذج علاقة المتطلب السابق بين مقررين"""
+    
+    STRICT = 'strict'
+    RECOMMENDED = 'recommended'
+    
+    PREREQUISITE_KINDS = [
+        (STRICT, _('Strict')),
+        (RECOMMENDED, _('Recommended')),
+    ]
+    
+    from_course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='prereq_links',
+        verbose_name=_("Course")
+    )
+    
+    to_course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='is_prereq_for_links',
+        verbose_name=_("Prerequisite")
+    )
+    
+    kind = models.CharField(
+        max_length=20,
+        choices=PREREQUISITE_KINDS,
+        default=STRICT,
+        verbose_name=_("Kind"),
+        help_text=_("Whether the prerequisite must be passed or is only recommended")
+    )
+    
+    class Meta:
+        verbose_name = _("Course Prerequisite")
+        verbose_name_plural = _("Course Prerequisites")
+        constraints = [
+            models.UniqueConstraint(fields=['from_course', 'to_course'], name='uniq_course_prerequisite'),
+        ]
+        indexes = [
+            models.Index(fields=['from_course', 'kind'], name='course_prereq_kind_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.from_course_id} → {self.to_course_id} ({self.kind})"
+
+
+# مدة صلاحية المقررات الإلزامية للبرامج في الذاكرة المؤقتة المشتركة (بالثواني)
+REQUIRED_COURSES_CACHE_TIMEOUT = 300
+
+
+def _required_courses_cache_key(program_id):
+    return f'program_required_courses:{program_id}'
+
+
+def required_course_ids(program_id):
+    """
+    معرفات المقررات الإلزامية الفعالة في برنامج (مخزنة في الذاكرة المؤقتة المشتركة)
+    
+    الذاكرة مشتركة بين جميع العمليات، ويتم مسحها عند تعديل علاقات البرامج
+    بالمقررات (انظر signals.py وinvalidate_required_course_ids).
+    
+    :param program_id: معرف البرنامج
+    :return: مجموعة ثابتة بمعرفات المقررات
+    """
+    key = _required_courses_cache_key(program_id)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            ProgramCourse.objects.filter(
+                program_id=program_id,
+                is_required=True,
+                status='active'
+            ).values_list('course_id', flat=True)
+        )
+        cache.set(key, course_ids, REQUIRED_COURSES_CACHE_TIMEOUT)
+    return course_ids
+
+
+def invalidate_required_course_ids(*program_ids):
+    """مسح المقررات الإلزامية المخزنة للبرامج المحددة (في جميع العمليات)"""
+    keys = [_required_courses_cache_key(program_id) for program_id in program_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # مسح مرة أخرى بعد تأكيد المعاملة حتى لا تبقى قيم أعادت عملية أخرى تخزينها قبل التأكيد
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class ProgramCourseManager(models.Manager):
+    """مدير العلاقات بين البرامج والمقررات (يحمل المقرر والبرنامج مسبقاً)"""
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related('course', 'program')
+
 
 class ProgramCourse(models.Model):
     """نموذج العلاقة بين البرنامج والمقرر"""
@@ -517,15 +841,27 @@ class ProgramCourse(models.Model):
         verbose_name=_("Updated At")
     )
     
+    objects = ProgramCourseManager()
+    
     class Meta:
         verbose_name = _("Program Course")
         verbose_name_plural = _("Program Courses")
-        unique_together = [['program', 'course']]
+        constraints = [
+            models.UniqueConstraint(fields=['program', 'course'], name='uniq_program_course'),
+        ]
         ordering = ['semester', 'course__code']
         indexes = [
             models.Index(fields=['semester'], name='semester_idx'),
-            models.Index(fields=['program', 'is_required'], name='program_required_idx'),
+            # يغطي استعلامات (البرنامج، الإلزامية، الحالة) ويعيد المقرر من الفهرس مباشرة
+            models.Index(
+                fields=['program', 'is_required', 'status'],
+                include=['course'],
+                name='pc_prog_req_stat_idx'
+            ),
             models.Index(fields=['status'], name='program_course_status_idx'),
+            # مقررات البرنامج حسب الحالة (program=… AND status='active'، مثل
+            # get_prerequisite_courses)؛ عمود المقرر يخدم الربط بجدول المتطلبات
+            models.Index(fields=['program', 'status', 'course'], name='pc_prog_stat_course_idx'),
         ]
         
     def __str__(self):
@@ -533,10 +869,15 @@ class ProgramCourse(models.Model):
     
     def clean(self):
         """التحقق من صحة بيانات العلاقة بين البرنامج والمقرر"""
+        # ملاحظة: لا يستدعى تلقائياً عند الحفظ؛ يجب استدعاء full_clean() عند الحفظ خارج النماذج (forms)
         super().clean()
-        
+        self._validate(ProgramSettings.objects.filter(program_id=self.program_id).first())
+    
+    def _validate(self, program_settings):
+        """التحقق من صحة العلاقة باستخدام إعدادات البرنامج المحملة مسبقاً"""
         # التحقق من أن المقرر ينتمي إلى نفس القسم كالبرنامج أو أن المقرر متطلب جامعة عام
-        if self.course.department.id != self.program.department.id:
+        # (مقارنة معرفات الأقسام مباشرة دون تحميل الأقسام)
+        if self.course.department_id != self.program.department_id:
             # التحقق مما إذا كان المقرر متطلب جامعة عام
             if not self.course.course_type == 'mandatory' and not self.is_required == False:
                 raise ValidationError({
@@ -544,7 +885,6 @@ class ProgramCourse(models.Model):
                 })
         
         # التحقق من أن الفصل الدراسي ضمن نطاق البرنامج
-        program_settings = ProgramSettings.objects.filter(program=self.program).first()
         if program_settings:
             total_semesters = program_settings.calculate_total_semesters()
             if self.semester > total_semesters:
@@ -552,27 +892,86 @@ class ProgramCourse(models.Model):
                     'semester': _('Semester number exceeds the total number of semesters in the program')
                 })
     
-    def save(self, *args, **kwargs):
-        """حفظ العلاقة مع التحقق من صحة البيانات"""
-        self.clean()
-        super().save(*args, **kwargs)
+    @classmethod
+    def bulk_set_status(cls, ids, status):
+        """
+        تغيير حالة مجموعة من العلاقات بعملية تحديث واحدة
+        
+        :param ids: معرفات العلاقات
+        :param status: الحالة الجديدة
+        :return: عدد العلاقات التي تم تحديثها
+        """
+        # update() لا يحدث حقول auto_now لذلك يتم تعيين updated_at صراحة
+        updated = cls.objects.filter(id__in=ids).update(status=status, updated_at=timezone.now())
+        # update() لا يرسل إشارات الحفظ لذلك يتم مسح الذاكرة المؤقتة هنا
+        invalidate_required_course_ids(
+            *cls.objects.filter(id__in=ids).values_list('program_id', flat=True).distinct()
+        )
+        return updated
+    
+    @classmethod
+    def validate_many(cls, program_courses):
+        """
+        التحقق من صحة مجموعة من العلاقات مع تحميل إعدادات البرامج في استعلام واحد
+        
+        :param program_courses: العلاقات المراد التحقق منها
+        :return: قائمة بأزواج (العلاقة، خطأ التحقق) للعلاقات غير الصحيحة
+        """
+        program_courses = list(program_courses)
+        settings_by_program = ProgramSettings.objects.in_bulk(
+            {program_course.program_id for program_course in program_courses},
+            field_name='program_id'
+        )
+        
+        errors = []
+        for program_course in program_courses:
+            try:
+                program_course._validate(settings_by_program.get(program_course.program_id))
+            except ValidationError as error:
+                errors.append((program_course, error))
+        
+        return errors
     
-    def get_prerequisite_courses(self):
-        """الحصول على المقررات المتطلبة السابقة لهذا المقرر في البرنامج"""
-        prereq_courses = self.course.prerequisites.all()
+    def get_prerequisite_courses(self, kind=None):
+        """
+        الحصول على المقررات المتطلبة السابقة لهذا المقرر في البرنامج
+        
+        :param kind: نوع المتطلب (strict أو recommended)، أو None لجميع الأنواع
+        """
+        # ربط مباشر بجدول المتطلبات دون تحميل أعمدة المقررات المتطلبة
+        # (شرطا الربط في نفس filter() حتى يطبقا على نفس صف جدول المتطلبات)
+        link_filter = {'course__is_prereq_for_links__from_course': self.course_id}
+        if kind is not None:
+            link_filter['course__is_prereq_for_links__kind'] = kind
         return ProgramCourse.objects.filter(
-            program=self.program,
-            course__in=prereq_courses,
-            status='active'
+            program_id=self.program_id,
+            status='active',
+            **link_filter
         )
     
     def check_prerequisites_in_earlier_semesters(self):
-        """التحقق من أن جميع المتطلبات السابقة في فصول دراسية سابقة"""
-        prereq_program_courses = self.get_prerequisite_courses()
-        for prereq in prereq_program_courses:
-            if prereq.semester >= self.semester:
-                return False, prereq.course.code
-        return True, None
+        """التحقق من أن جميع المتطلبات السابقة الإلزامية في فصول دراسية سابقة"""
+        # استعلام واحد يعيد رمز أول متطلب غير موجود في فصل سابق
+        # (المتطلبات الموصى بها لا تفرض ترتيباً)
+        violating_code = self.get_prerequisite_courses(kind=CoursePrerequisite.STRICT).filter(
+            semester__gte=self.semester
+        ).values_list('course__code', flat=True).first()
+        return violating_code is None, violating_code
+
+class StudyPlanManager(models.Manager):
+    """مدير الخطط الدراسية"""
+    
+    def with_full_structure(self):
+        """الخطط مع فصولها ومقرراتها ومجموعات مقرراتها (عدد ثابت من الاستعلامات)"""
+        semester_courses = SemesterCourse.objects.select_related('course', 'course_group')
+        semester_plans = SemesterPlan.objects.select_related('academic_level').prefetch_related(
+            Prefetch('semester_courses', queryset=semester_courses)
+        )
+        return self.get_queryset().select_related('program').prefetch_related(
+            'course_groups',
+            Prefetch('semester_plans', queryset=semester_plans)
+        )
+
 
 class StudyPlan(models.Model):
     """نموذج الخطة الدراسية"""
@@ -605,6 +1004,12 @@ class StudyPlan(models.Model):
     total_credit_hours = models.PositiveIntegerField(
         verbose_name=_("Total Credit Hours")
     )
+    scheduled_credit_hours = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Scheduled Credit Hours"),
+        help_text=_("Sum of the credits of the courses scheduled in the plan's semesters (maintained automatically)")
+    )
     status = models.CharField(
         max_length=20,
         choices=PLAN_STATUS,
@@ -625,6 +1030,8 @@ class StudyPlan(models.Model):
         verbose_name=_("Approval Date")
     )
 
+    objects = StudyPlanManager()
+
     class Meta:
         verbose_name = _("Study Plan")
         verbose_name_plural = _("Study Plans")
@@ -633,6 +1040,11 @@ class StudyPlan(models.Model):
         indexes = [
             models.Index(fields=['status'], name='plan_status_idx'),
             models.Index(fields=['effective_from'], name='plan_effective_from_idx'),
+            models.Index(
+                fields=['program', '-effective_from'],
+                condition=Q(status='active'),
+                name='plan_prog_active_partial'
+            ),
         ]
 
     def __str__(self):
@@ -696,12 +1108,19 @@ class CourseGroup(models.Model):
 class SemesterPlan(models.Model):
     """نموذج الخطة الفصلية"""
     
+    FALL = 'fall'
+    SPRING = 'spring'
+    SUMMER = 'summer'
+    
     SEMESTER_TYPES = [
-        ('fall', _('Fall')),
-        ('spring', _('Spring')),
-        ('summer', _('Summer')),
+        (FALL, _('Fall')),
+        (SPRING, _('Spring')),
+        (SUMMER, _('Summer')),
     ]
     
+    # خريطة أسماء الفصول (بحث مباشر بدلاً من المرور على قائمة الخيارات)
+    _SEMESTER_TYPES_MAP = dict(SEMESTER_TYPES)
+    
     study_plan = models.ForeignKey(
         StudyPlan,
         on_delete=models.CASCADE,
@@ -720,6 +1139,14 @@ class SemesterPlan(models.Model):
         verbose_name=_("Semester Type")
     )
     
+    semester_order = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name=_("Semester Order"),
+        help_text=_("Position of the semester in the plan (calculated from year and semester type)")
+    )
+    
     academic_level = models.ForeignKey(
         'AcademicLevel',
         on_delete=models.CASCADE,
@@ -772,18 +1199,26 @@ class SemesterPlan(models.Model):
         verbose_name = _("Semester Plan")
         verbose_name_plural = _("Semester Plans")
         unique_together = [['study_plan', 'year', 'semester_type']]
-        ordering = ['study_plan', 'year', 'semester_type']
+        # semester_order رقم صحيح محسوب من السنة ونوع الفصل (نفس الترتيب بمقارنة أرخص)
+        ordering = ['study_plan', 'semester_order']
         indexes = [
             models.Index(fields=['year', 'semester_type'], name='semester_year_type_idx'),
+            models.Index(fields=['study_plan', 'academic_level', 'semester_type'], name='semester_plan_level_type_idx'),
             models.Index(fields=['academic_level'], name='semester_level_idx'),
             models.Index(fields=['is_summer'], name='is_summer_idx'),
         ]
     
     def __str__(self):
-        return f"{self.study_plan.name} - Year {self.year} {self.get_semester_type_display()}"
+        return f"{self.study_plan.name} - Year {self.year} {self.semester_type_display}"
+    
+    @property
+    def semester_type_display(self):
+        """اسم نوع الفصل الدراسي"""
+        return self._SEMESTER_TYPES_MAP.get(self.semester_type, self.semester_type)
     
     def clean(self):
         """التحقق من صحة بيانات الخطة الفصلية"""
+        # ملاحظة: لا يستدعى تلقائياً عند الحفظ؛ يجب استدعاء full_clean() عند الحفظ خارج النماذج (forms)
         super().clean()
         
         # التحقق من أن المستوى الأكاديمي ينتمي إلى نفس البرنامج
@@ -804,25 +1239,35 @@ class SemesterPlan(models.Model):
             })
     
     def save(self, *args, **kwargs):
-        """حفظ الخطة الفصلية مع التحقق من صحة البيانات"""
+        """حفظ الخطة الفصلية"""
         # تعيين الفصل الصيفي تلقائياً
-        if self.semester_type == 'summer':
+        if self.semester_type == self.SUMMER:
             self.is_summer = True
-            
-        self.clean()
+        
+        self.semester_order = _semester_order(self.year, self.semester_type)
         super().save(*args, **kwargs)
     
+    @cached_property
+    def credit_breakdown(self):
+        """حساب الساعات المعتمدة (الإجمالية والإلزامية والاختيارية) في استعلام واحد"""
+        totals = self.semester_courses.aggregate(
+            total=Sum('course__credits'),
+            required=Sum('course__credits', filter=Q(is_required=True)),
+            elective=Sum('course__credits', filter=Q(is_required=False)),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+    
     def get_total_credits(self):
         """حساب إجمالي الساعات المعتمدة للمقررات في هذا الفصل"""
-        return self.semester_courses.aggregate(Sum('course__credits'))['course__credits__sum'] or 0
+        return self.credit_breakdown['total']
     
     def get_required_credits(self):
         """حساب الساعات المعتمدة للمقررات الإلزامية في هذا الفصل"""
-        return self.semester_courses.filter(is_required=True).aggregate(Sum('course__credits'))['course__credits__sum'] or 0
+        return self.credit_breakdown['required']
     
     def get_elective_credits(self):
         """حساب الساعات المعتمدة للمقررات الاختيارية في هذا الفصل"""
-        return self.semester_courses.filter(is_required=False).aggregate(Sum('course__credits'))['course__credits__sum'] or 0
+        return self.credit_breakdown['elective']
     
     def map_to_academic_semester(self, academic_year):
         """ربط الخطة الفصلية بفصل دراسي فعلي في سنة أكاديمية محددة"""
@@ -838,9 +1283,26 @@ class SemesterPlan(models.Model):
             return None
 
 
+# ترتيب أنواع الفصول داخل السنة (الأنواع الأخرى تأتي بعد الربيع)
+SEMESTER_ORDER = {SemesterPlan.FALL: 1, SemesterPlan.SPRING: 2, SemesterPlan.SUMMER: 3}
+
+
+def _needs_clean(update_fields, clean_fields):
+    """هل يجب التحقق من صحة البيانات عند الحفظ (الحفظ الكامل أو تعديل حقل يتم التحقق منه)"""
+    return update_fields is None or not clean_fields.isdisjoint(update_fields)
+
+
+def _semester_order(year, semester_type):
+    """ترتيب الفصل الدراسي داخل الخطة (السنة ثم الخريف ثم الربيع ثم الصيفي)"""
+    return year * 10 + SEMESTER_ORDER.get(semester_type, 3)
+
+
 class SemesterCourse(models.Model):
     """نموذج المقررات في الفصل الدراسي"""
     
+    # الحقول التي يتحقق منها clean() (لا حاجة للتحقق عند حفظ حقول أخرى فقط)
+    _CLEAN_FIELDS = frozenset({'course', 'semester_plan', 'course_group'})
+    
     semester_plan = models.ForeignKey(
         SemesterPlan,
         on_delete=models.CASCADE,
@@ -896,7 +1358,9 @@ class SemesterCourse(models.Model):
     class Meta:
         verbose_name = _("Semester Course")
         verbose_name_plural = _("Semester Courses")
-        unique_together = [['semester_plan', 'course']]
+        constraints = [
+            models.UniqueConstraint(fields=['semester_plan', 'course'], name='uniq_semester_plan_course'),
+        ]
         ordering = ['semester_plan', 'order', 'course__code']
         indexes = [
             models.Index(fields=['is_required'], name='course_required_idx'),
@@ -916,41 +1380,55 @@ class SemesterCourse(models.Model):
                 'course_group': _("Course group must belong to the same study plan")
             })
         
-        # التحقق من المتطلبات السابقة للمقرر
-        prerequisites = self.course.prerequisites.all()
-        if prerequisites.exists():
-            # التحقق من أن جميع المتطلبات السابقة موجودة في فصول سابقة
-            current_semester_order = self.semester_plan.year * 10 + (
-                1 if self.semester_plan.semester_type == 'fall' else 
-                2 if self.semester_plan.semester_type == 'spring' else 3
-            )
-            
-            for prereq in prerequisites:
-                # البحث عن المقرر المتطلب في الخطة الدراسية
-                prereq_courses = SemesterCourse.objects.filter(
-                    semester_plan__study_plan=self.semester_plan.study_plan,
-                    course=prereq
-                )
-                
-                if not prereq_courses.exists():
-                    continue  # قد يكون المتطلب غير موجود في الخطة الدراسية (مثل متطلبات القبول)
-                
-                for prereq_course in prereq_courses:
-                    prereq_semester_order = prereq_course.semester_plan.year * 10 + (
-                        1 if prereq_course.semester_plan.semester_type == 'fall' else 
-                        2 if prereq_course.semester_plan.semester_type == 'spring' else 3
-                    )
-                    
-                    if prereq_semester_order >= current_semester_order:
-                        raise ValidationError({
-                            'course': _("Prerequisite %(prereq)s must be in an earlier semester") % {
-                                'prereq': prereq.code
-                            }
-                        })
+        # لا حاجة للتحقق من ترتيب المتطلبات السابقة إذا كان البرنامج لا يفرضها
+        # (إذا كانت الإعدادات محملة مسبقاً عبر select_related)
+        program_settings = self._loaded_program_settings()
+        if program_settings is not None and not program_settings.enforce_prerequisites:
+            return
+        
+        # التحقق من أن جميع المتطلبات السابقة موجودة في فصول سابقة
+        # (استعلام واحد يعيد أول متطلب موجود في الخطة في فصل لاحق أو نفس الفصل؛
+        # قد يكون بعض المتطلبات غير موجود في الخطة مثل متطلبات القبول)
+        violating_code = SemesterCourse.objects.filter(
+            semester_plan__study_plan_id=self.semester_plan.study_plan_id,
+            course__is_prereq_for_links__from_course=self.course_id,
+            course__is_prereq_for_links__kind=CoursePrerequisite.STRICT,
+            semester_plan__semester_order__gte=self.semester_plan.semester_order
+        ).exclude(
+            semester_plan__study_plan__program__settings__enforce_prerequisites=False
+        ).values_list('course__code', flat=True).first()
+        
+        if violating_code is not None:
+            raise ValidationError({
+                'course': _("Prerequisite %(prereq)s must be in an earlier semester") % {
+                    'prereq': violating_code
+                }
+            })
+    
+    def _loaded_program_settings(self):
+        """
+        إعدادات البرنامج إذا كانت محملة مسبقاً دون استعلامات إضافية
+        
+        (مثل select_related('semester_plan__study_plan__program__settings'))
+        وإلا None
+        """
+        obj = self
+        for owner, field in (
+            (SemesterCourse, 'semester_plan'),
+            (SemesterPlan, 'study_plan'),
+            (StudyPlan, 'program'),
+        ):
+            if not getattr(owner, field).is_cached(obj):
+                return None
+            obj = getattr(obj, field)
+        if not AcademicProgram.settings.is_cached(obj):
+            return None
+        return getattr(obj, 'settings', None)
     
     def save(self, *args, **kwargs):
         """حفظ المقرر في الفصل مع التحقق من صحة البيانات"""
-        self.clean()
+        if _needs_clean(kwargs.get('update_fields'), self._CLEAN_FIELDS):
+            self.clean()
         super().save(*args, **kwargs)
     
     def get_actual_semester(self, academic_year):
@@ -973,6 +1451,13 @@ class ProgramSettings(models.Model):
         ('trimester', _('Trimester System')),
     ]
     
+    # عدد الفصول في السنة لكل نظام: (دون فصل صيفي، مع فصل صيفي)
+    _SEMESTERS_PER_YEAR = {
+        'semester': (2, 3),
+        'quarter': (4, 4),
+        'trimester': (3, 3),
+    }
+    
     program = models.OneToOneField(
         AcademicProgram,
         on_delete=models.CASCADE,
@@ -1130,17 +1615,9 @@ class ProgramSettings(models.Model):
 
     def calculate_total_semesters(self):
         """حساب العدد الإجمالي للفصول الدراسية"""
-        years = float(self.standard_duration_years)
-        if self.semester_system == 'semester':
-            semesters_per_year = 3 if self.summer_semester_enabled else 2
-        elif self.semester_system == 'quarter':
-            semesters_per_year = 4
-        elif self.semester_system == 'trimester':
-            semesters_per_year = 3
-        else:
-            semesters_per_year = 2
-            
-        return int(years * semesters_per_year)
+        without_summer, with_summer = self._SEMESTERS_PER_YEAR.get(self.semester_system, (2, 2))
+        semesters_per_year = with_summer if self.summer_semester_enabled else without_summer
+        return int(float(self.standard_duration_years) * semesters_per_year)
 
     def validate_semester_credits(self, credits, semester_type='regular'):
         """التحقق من صحة عدد الساعات في الفصل"""
@@ -1169,42 +1646,100 @@ class ProgramSettings(models.Model):
                 )
         return True
     
+    def _satisfied_prerequisites(self, student, prereq_ids, semester):
+        """
+        معرفات المتطلبات السابقة التي استوفاها الطالب
+        
+        تشمل المقررات التي اجتازها، والمسجلة في نفس الفصل إذا كان التسجيل المتزامن
+        مسموحًا (UNION في استعلام واحد).
+        """
+        from apps.academic.models import StudentGrade
+        
+        satisfied_qs = StudentGrade.objects.filter(
+            student=student,
+            course_id__in=prereq_ids,
+            grade__is_passing=True
+        ).values_list('course_id', flat=True)
+        
+        if self.allow_concurrent_prerequisites:
+            from apps.academic.models import CourseRegistration
+            satisfied_qs = satisfied_qs.union(
+                CourseRegistration.objects.filter(
+                    student=student,
+                    course_id__in=prereq_ids,
+                    semester=semester,
+                    status__in=['active', 'approved']
+                ).values_list('course_id', flat=True)
+            )
+        
+        return set(satisfied_qs)
+    
     def validate_course_registration(self, student, course, semester):
         """التحقق من صحة تسجيل الطالب للمقرر"""
         # التحقق من المتطلبات السابقة
         if self.enforce_prerequisites:
-            from apps.academic.models import StudentGrade
+            # الحصول على المتطلبات السابقة الإلزامية للمقرر (الموصى بها لا تمنع التسجيل)
+            prerequisites = list(
+                CoursePrerequisite.objects.filter(
+                    from_course=course,
+                    kind=CoursePrerequisite.STRICT
+                ).values_list('to_course_id', 'to_course__code')
+            )
+            if not prerequisites:
+                return True, None
+            
+            satisfied = self._satisfied_prerequisites(
+                student, [prereq_id for prereq_id, _code in prerequisites], semester
+            )
             
-            # الحصول على المتطلبات السابقة للمقرر
-            prerequisites = course.prerequisites.all()
-            if not prerequisites.exists():
-                return True
-                
             # التحقق من اجتياز الطالب للمتطلبات السابقة
-            for prereq in prerequisites:
-                # التحقق من وجود درجة ناجحة للمتطلب السابق
-                passed_grade = StudentGrade.objects.filter(
-                    student=student,
-                    course=prereq,
-                    is_passing=True
-                ).exists()
-                
-                # التحقق من التسجيل المتزامن إذا كان مسموحًا
-                concurrent_registration = False
-                if self.allow_concurrent_prerequisites:
-                    from apps.academic.models import CourseRegistration
-                    concurrent_registration = CourseRegistration.objects.filter(
-                        student=student,
-                        course=prereq,
-                        semester=semester,
-                        status__in=['active', 'approved']
-                    ).exists()
-                
-                if not passed_grade and not concurrent_registration:
-                    return False, prereq.code
+            for prereq_id, prereq_code in prerequisites:
+                if prereq_id not in satisfied:
+                    return False, prereq_code
                     
         return True, None
     
+    def validate_course_registrations(self, student, courses, semester):
+        """
+        التحقق من صحة تسجيل الطالب لمجموعة مقررات دفعة واحدة
+        
+        :param student: الطالب
+        :param courses: المقررات أو معرفاتها
+        :param semester: الفصل الدراسي
+        :return: قاموس {معرف المقرر: (صحة التسجيل، رمز أول متطلب غير مستوفى أو None)}
+        """
+        course_ids = [getattr(course, 'pk', course) for course in courses]
+        results = dict.fromkeys(course_ids, (True, None))
+        if not self.enforce_prerequisites or not course_ids:
+            return results
+        
+        # جميع المتطلبات السابقة الإلزامية للمقررات المحددة (استعلام واحد)
+        prereq_map = {}
+        for course_id, prereq_id, prereq_code in CoursePrerequisite.objects.filter(
+            from_course_id__in=course_ids,
+            kind=CoursePrerequisite.STRICT
+        ).values_list('from_course_id', 'to_course_id', 'to_course__code'):
+            prereq_map.setdefault(course_id, []).append((prereq_id, prereq_code))
+        
+        if not prereq_map:
+            return results
+        
+        all_prereq_ids = {prereq_id for prereqs in prereq_map.values() for prereq_id, _code in prereqs}
+        satisfied = self._satisfied_prerequisites(student, all_prereq_ids, semester)
+        
+        for course_id, prereqs in prereq_map.items():
+            for prereq_id, prereq_code in prereqs:
+                if prereq_id not in satisfied:
+                    results[course_id] = (False, prereq_code)
+                    break
+        
+        return results
+    
+    @property
+    def required_course_ids(self):
+        """معرفات المقررات الإلزامية الفعالة في البرنامج"""
+        return required_course_ids(self.program_id)
+    
     def validate_graduation_requirements(self, student):
         """التحقق من استيفاء متطلبات التخرج"""
         from apps.academic.models import StudentGrade
@@ -1213,23 +1748,20 @@ class ProgramSettings(models.Model):
         if student.cgpa < self.min_cgpa_required:
             return False, _('CGPA is below the minimum required for graduation')
         
-        # التحقق من اجتياز جميع المقررات المطلوبة
-        required_courses = ProgramCourse.objects.filter(
-            program=self.program,
-            is_required=True,
-            status='active'
-        ).values_list('course', flat=True)
-        
-        passed_courses = StudentGrade.objects.filter(
-            student=student,
-            course__in=required_courses,
-            is_passing=True
-        ).values_list('course', flat=True).distinct()
-        
-        missing_courses = set(required_courses) - set(passed_courses)
-        if missing_courses:
-            missing_course_codes = Course.objects.filter(id__in=missing_courses).values_list('code', flat=True)
-            return False, _('Missing required courses: %s') % ', '.join(missing_course_codes)
+        # التحقق من اجتياز جميع المقررات المطلوبة (الفرق محسوب في قاعدة البيانات
+        # باستعلام واحد بدلاً من تحميل المقررات المطلوبة والمجتازة)
+        required_ids = self.required_course_ids
+        if required_ids:
+            missing_course_codes = list(
+                Course.objects.filter(id__in=required_ids).exclude(
+                    id__in=StudentGrade.objects.filter(
+                        student=student,
+                        grade__is_passing=True
+                    ).values('course_id')
+                ).order_by('code').values_list('code', flat=True)
+            )
+            if missing_course_codes:
+                return False, _('Missing required courses: %s') % ', '.join(missing_course_codes)
         
         # التحقق من عدد الساعات المعتمدة الاختيارية
         active_study_plan = StudyPlan.objects.filter(
@@ -1239,12 +1771,17 @@ class ProgramSettings(models.Model):
         
         if active_study_plan:
             elective_credits_required = active_study_plan.elective_credits
-            elective_credits_earned = StudentGrade.objects.filter(
+            # الساعات الاختيارية المكتسبة محسوبة مسبقاً عند رصد الدرجات
+            elective_credits_earned = StudentAcademicStats.objects.filter(
                 student=student,
-                course__program_courses__program=self.program,
-                course__program_courses__is_required=False,
-                is_passing=True
-            ).aggregate(Sum('course__credits'))['course__credits__sum'] or 0
+                program=self.program
+            ).values_list('elective_credits_earned', flat=True).first()
+            if elective_credits_earned is None:
+                # لا توجد إحصائيات للطالب بعد (درجات سابقة لهذا الجدول أو مدرجة دون
+                # إشارات): حسابها من الدرجات الآن وحفظها للتحققات اللاحقة
+                elective_credits_earned = StudentAcademicStats.recalculate(
+                    student.pk, [self.program_id]
+                )[0].elective_credits_earned
             
             if elective_credits_earned < elective_credits_required:
                 return False, _('Insufficient elective credits: %(earned)s/%(required)s') % {
@@ -1254,9 +1791,96 @@ class ProgramSettings(models.Model):
         
         return True, _('All graduation requirements have been met')
 
+class StudentAcademicStats(models.Model):
+    """
+    إحصائيات الطالب الأكاديمية في البرنامج
+    
+    يتم تحديث الساعات المكتسبة عند رصد درجات الطالب (انظر signals.py) بدلاً من
+    تجميعها من جدول الدرجات عند كل تحقق من متطلبات التخرج.
+    """
+    
+    student = models.ForeignKey(
+        'users.Student',
+        on_delete=models.CASCADE,
+        related_name='academic_stats',
+        verbose_name=_("Student")
+    )
+    program = models.ForeignKey(
+        AcademicProgram,
+        on_delete=models.CASCADE,
+        related_name='student_stats',
+        verbose_name=_("Program")
+    )
+    required_credits_earned = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Required Credits Earned")
+    )
+    elective_credits_earned = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Elective Credits Earned")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Student Academic Stats")
+        verbose_name_plural = _("Student Academic Stats")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'program'],
+                name='uniq_student_program_stats'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.program}"
+
+    @classmethod
+    def recalculate(cls, student_id, program_ids, create=True):
+        """
+        إعادة حساب الساعات المكتسبة للطالب في البرامج المحددة
+        
+        :param student_id: معرف الطالب
+        :param program_ids: معرفات البرامج التي يتبعها المقرر
+        :param create: إنشاء سجل الإحصائيات إذا لم يكن موجوداً؛ عند False يتم
+            تحديث السجلات الموجودة فقط (مثل حذف الدرجات ضمن حذف الطالب نفسه)
+        :return: قائمة بسجلات الإحصائيات المحدثة (فارغة عند create=False)
+        """
+        from apps.academic.models import StudentGrade
+        
+        stats = []
+        for program_id in program_ids:
+            totals = StudentGrade.objects.filter(
+                student_id=student_id,
+                grade__is_passing=True,
+                course__program_courses__program_id=program_id
+            ).aggregate(
+                required=Sum('course__credits', filter=Q(course__program_courses__is_required=True)),
+                elective=Sum('course__credits', filter=Q(course__program_courses__is_required=False)),
+            )
+            values = {
+                'required_credits_earned': totals['required'] or 0,
+                'elective_credits_earned': totals['elective'] or 0,
+            }
+            if not create:
+                # update() لا يحدث حقول auto_now لذلك يتم تعيين updated_at صراحة
+                cls.objects.filter(student_id=student_id, program_id=program_id).update(
+                    updated_at=timezone.now(), **values
+                )
+                continue
+            obj, _created = cls.objects.update_or_create(
+                student_id=student_id,
+                program_id=program_id,
+                defaults=values
+            )
+            stats.append(obj)
+        return stats
+
 class AcademicLevel(models.Model):
     """نموذج المستوى الدراسي"""
     
+    # الحقول التي يتحقق منها clean() (لا حاجة للتحقق عند حفظ حقول أخرى فقط)
+    _CLEAN_FIELDS = frozenset({'prerequisite_level', 'program', 'level_number'})
+    
     program = models.ForeignKey(
         AcademicProgram,
         on_delete=models.CASCADE,
@@ -1280,6 +1904,13 @@ class AcademicLevel(models.Model):
         help_text=_("Required credits to complete this level")
     )
     
+    total_credits = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Total Credits"),
+        help_text=_("Sum of the credits of the courses planned in this level (maintained automatically)")
+    )
+    
     min_cgpa = models.DecimalField(
         max_digits=3,
         decimal_places=2,
@@ -1351,35 +1982,38 @@ class AcademicLevel(models.Model):
     
     def save(self, *args, **kwargs):
         """حفظ المستوى الدراسي مع التحقق من صحة البيانات"""
-        self.clean()
+        if _needs_clean(kwargs.get('update_fields'), self._CLEAN_FIELDS):
+            self.clean()
         super().save(*args, **kwargs)
     
     def get_total_credits(self):
         """حساب إجمالي الساعات المعتمدة للمقررات في هذا المستوى"""
-        return self.semester_plans.aggregate(
-            total_credits=Sum(models.F('semester_courses__course__credits'))
-        )['total_credits'] or 0
+        # يتم تحديث القيمة تلقائياً عند تعديل مقررات الفصول (انظر signals.py)
+        return self.total_credits
     
     def get_semesters(self):
         """الحصول على الفصول الدراسية في هذا المستوى"""
-        return self.semester_plans.all().order_by('year', 'semester_type')
+        return self.semester_plans.all().order_by('semester_order')
     
     def get_courses(self):
         """الحصول على جميع المقررات في هذا المستوى"""
-        from django.db.models import Prefetch
+        semester_courses = SemesterCourse.objects.filter(
+            semester_plan__academic_level=self
+        ).select_related('semester_plan')
         
-        return Course.objects.filter(
+        return Course.objects.slim().filter(
             semester_courses__semester_plan__academic_level=self
         ).distinct().prefetch_related(
-            Prefetch('semester_courses', queryset=SemesterCourse.objects.filter(
-                semester_plan__academic_level=self
-            ))
+            Prefetch('semester_courses', queryset=semester_courses)
         )
 
 
 class AcademicLevelSemester(models.Model):
     """نموذج ربط المستويات الأكاديمية بالفصول الدراسية الفعلية"""
     
+    # الحقول التي يتحقق منها clean() (لا حاجة للتحقق عند حفظ حقول أخرى فقط)
+    _CLEAN_FIELDS = frozenset({'semester', 'academic_year'})
+    
     academic_level = models.ForeignKey(
         AcademicLevel,
         on_delete=models.CASCADE,
@@ -1453,32 +2087,26 @@ class AcademicLevelSemester(models.Model):
     
     def save(self, *args, **kwargs):
         """حفظ ربط المستوى بالفصل مع التحقق من صحة البيانات"""
-        self.clean()
+        if _needs_clean(kwargs.get('update_fields'), self._CLEAN_FIELDS):
+            self.clean()
         super().save(*args, **kwargs)
     
     def get_semester_courses(self):
         """الحصول على مقررات الفصل الدراسي لهذا المستوى"""
-        # الحصول على خطة دراسية نشطة للبرنامج
+        from apps.academic.models import Semester
+        
+        # أحدث خطة دراسية نشطة لبرنامج المستوى، ونوع الفصل الدراسي
+        # (استعلامات فرعية ضمن نفس الاستعلام دون تحميل المستوى أو الفصل)
         active_study_plan = StudyPlan.objects.filter(
-            program=self.academic_level.program,
+            program__levels=self.academic_level_id,
             status='active'
-        ).order_by('-effective_from').first()
-        
-        if not active_study_plan:
-            return []
-        
-        # الحصول على خطة الفصل الدراسي المناسبة
-        semester_plans = SemesterPlan.objects.filter(
-            study_plan=active_study_plan,
-            academic_level=self.academic_level,
-            semester_type=self.semester.semester_type
-        )
-        
-        if not semester_plans.exists():
-            return []
+        ).order_by('-effective_from').values('pk')[:1]
+        semester_type = Semester.objects.filter(pk=self.semester_id).values('semester_type')[:1]
         
-        # الحصول على مقررات الفصل
+        # الحصول على مقررات الفصل في خطة الفصل الدراسي المناسبة
         return SemesterCourse.objects.filter(
-            semester_plan__in=semester_plans
+            semester_plan__study_plan=Subquery(active_study_plan),
+            semester_plan__academic_level_id=self.academic_level_id,
+            semester_plan__semester_type=Subquery(semester_type)
         ).select_related('course', 'semester_plan')
 
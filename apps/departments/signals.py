@@ -0,0 +1,166 @@
+"""
+إشارات تطبيق الأقسام
+"""
+
+from django.db.models import F, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Course, StudyPlan, SemesterPlan, SemesterCourse, AcademicLevel, ProgramCourse,
+    StudentAcademicStats, invalidate_required_course_ids
+)
+
+
+def _add_plan_credits(semester_plan_id, delta):
+    """إضافة فرق الساعات المعتمدة إلى الخطة الدراسية بعملية تحديث واحدة"""
+    StudyPlan.objects.filter(semester_plans=semester_plan_id).update(
+        scheduled_credit_hours=F('scheduled_credit_hours') + delta
+    )
+
+
+def recalculate_plan_credits(study_plan_id):
+    """إعادة حساب الساعات المعتمدة المجدولة في الخطة الدراسية من مقرراتها"""
+    total = SemesterCourse.objects.filter(
+        semester_plan__study_plan_id=study_plan_id
+    ).aggregate(total=Sum('course__credits'))['total'] or 0
+    StudyPlan.objects.filter(pk=study_plan_id).update(scheduled_credit_hours=total)
+
+
+def _study_plan_id(semester_plan_id):
+    """معرف الخطة الدراسية التي تتبعها الخطة الفصلية (None إذا لم تكن موجودة)"""
+    return SemesterPlan.objects.filter(
+        pk=semester_plan_id
+    ).values_list('study_plan_id', flat=True).first()
+
+
+def recalculate_level_credits(academic_level_id):
+    """إعادة حساب إجمالي الساعات المعتمدة للمستوى الدراسي من مقررات فصوله"""
+    total = SemesterCourse.objects.filter(
+        semester_plan__academic_level_id=academic_level_id
+    ).aggregate(total=Sum('course__credits'))['total'] or 0
+    AcademicLevel.objects.filter(pk=academic_level_id).update(total_credits=total)
+
+
+@receiver(pre_save, sender=SemesterCourse)
+def remember_semester_plan(sender, instance, raw=False, **kwargs):
+    """حفظ الخطة الفصلية السابقة للمقرر لمعرفة ما إذا نقل إلى خطة أخرى عند التعديل"""
+    if raw or instance._state.adding:
+        instance._previous_semester_plan_id = None
+        return
+    instance._previous_semester_plan_id = SemesterCourse.objects.filter(
+        pk=instance.pk
+    ).values_list('semester_plan_id', flat=True).first()
+
+
+@receiver(post_save, sender=SemesterCourse)
+@receiver(post_delete, sender=SemesterCourse)
+def update_level_credits(sender, instance, **kwargs):
+    """
+    تحديث إجمالي الساعات المعتمدة للمستوى الدراسي عند تعديل مقررات فصوله
+    
+    إذا نقل المقرر إلى خطة فصلية في مستوى آخر يعاد حساب المستوى السابق أيضاً.
+    """
+    semester_plan_ids = {instance.semester_plan_id}
+    previous_semester_plan_id = getattr(instance, '_previous_semester_plan_id', None)
+    if previous_semester_plan_id is not None:
+        semester_plan_ids.add(previous_semester_plan_id)
+    
+    academic_level_ids = SemesterPlan.objects.filter(
+        pk__in=semester_plan_ids,
+        academic_level__isnull=False
+    ).values_list('academic_level_id', flat=True).distinct()
+    for academic_level_id in academic_level_ids:
+        recalculate_level_credits(academic_level_id)
+
+
+@receiver(post_save, sender=SemesterCourse)
+def update_plan_credits_on_save(sender, instance, created, **kwargs):
+    """تحديث الساعات المعتمدة المجدولة عند إضافة مقرر إلى خطة فصلية"""
+    if created:
+        _add_plan_credits(instance.semester_plan_id, instance.course.credits)
+        return
+    
+    # قد يتغير المقرر أو الخطة الفصلية عند التعديل (نادر)، لذلك تعاد العملية كاملة
+    # للخطة الحالية وللخطة التي نقل منها المقرر إن اختلفت
+    study_plan_ids = {_study_plan_id(instance.semester_plan_id)}
+    previous_semester_plan_id = getattr(instance, '_previous_semester_plan_id', None)
+    if previous_semester_plan_id not in (None, instance.semester_plan_id):
+        study_plan_ids.add(_study_plan_id(previous_semester_plan_id))
+    for study_plan_id in study_plan_ids - {None}:
+        recalculate_plan_credits(study_plan_id)
+
+
+@receiver(post_delete, sender=SemesterCourse)
+def update_plan_credits_on_delete(sender, instance, **kwargs):
+    """تحديث الساعات المعتمدة المجدولة عند حذف مقرر من خطة فصلية"""
+    # إعادة حساب بدلاً من طرح الساعات: إذا كانت القيمة المخزنة أقل من الفعلية
+    # (إدراج جماعي دون إشارات) فإن الطرح يخالف قيد القيمة غير السالبة ويفشل الحذف
+    study_plan_id = _study_plan_id(instance.semester_plan_id)
+    if study_plan_id is not None:
+        recalculate_plan_credits(study_plan_id)
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_credits(sender, instance, raw=False, update_fields=None, **kwargs):
+    """حفظ عدد الساعات المعتمدة السابق للمقرر لمعرفة ما إذا تغير بعد الحفظ"""
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'credits' not in update_fields:
+        return
+    instance._previous_credits = Course.objects.filter(
+        pk=instance.pk
+    ).values_list('credits', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def update_credits_on_course_change(sender, instance, created, **kwargs):
+    """
+    إعادة حساب الساعات المعتمدة للخطط الدراسية والمستويات الدراسية التي تتضمن
+    المقرر عند تغيير ساعاته
+    """
+    previous_credits = instance.__dict__.pop('_previous_credits', None)
+    if created or previous_credits is None or previous_credits == instance.credits:
+        return
+    
+    placements = SemesterCourse.objects.filter(course=instance)
+    study_plan_ids = placements.values_list('semester_plan__study_plan_id', flat=True).distinct()
+    for study_plan_id in study_plan_ids:
+        recalculate_plan_credits(study_plan_id)
+    
+    academic_level_ids = placements.filter(
+        semester_plan__academic_level__isnull=False
+    ).values_list('semester_plan__academic_level_id', flat=True).distinct()
+    for academic_level_id in academic_level_ids:
+        recalculate_level_credits(academic_level_id)
+
+
+@receiver(post_save, sender=ProgramCourse)
+@receiver(post_delete, sender=ProgramCourse)
+def clear_required_courses_cache(sender, instance, **kwargs):
+    """مسح ذاكرة المقررات الإلزامية للبرنامج عند تعديل علاقاته بالمقررات"""
+    invalidate_required_course_ids(instance.program_id)
+
+
+@receiver(post_save, sender='academic.StudentGrade')
+def update_student_academic_stats(sender, instance, **kwargs):
+    """تحديث الساعات المكتسبة للطالب عند رصد درجة أو تعديلها"""
+    program_ids = ProgramCourse.objects.filter(
+        course_id=instance.course_id
+    ).values_list('program_id', flat=True).distinct()
+    StudentAcademicStats.recalculate(instance.student_id, program_ids)
+
+
+@receiver(post_delete, sender='academic.StudentGrade')
+def update_student_academic_stats_on_delete(sender, instance, **kwargs):
+    """
+    تحديث الساعات المكتسبة للطالب عند حذف درجة
+    
+    يتم تحديث السجلات الموجودة فقط دون إنشاء سجلات جديدة: عند حذف الطالب
+    (أو المستخدم) تحذف سجلات إحصائياته قبل درجاته، وإعادة إنشائها هنا تفشل
+    عند تأكيد المعاملة.
+    """
+    program_ids = ProgramCourse.objects.filter(
+        course_id=instance.course_id
+    ).values_list('program_id', flat=True).distinct()
+    StudentAcademicStats.recalculate(instance.student_id, program_ids, create=False)
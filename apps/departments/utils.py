@@ -3,13 +3,49 @@
 تحتوي على دوال مساعدة مثل توليد الاختصارات وتنسيق الأرقام
 """
 
+import os
+import re
+import datetime
+from functools import lru_cache
 from typing import Type, Optional
 from django.db import models
 from django.utils.text import slugify
-from django.db.models import Max, F, Value, CharField
-from django.db.models.functions import Substr, Cast, RegexpReplace
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from apps.core.numbering import BaseNumberingSystem, DepartmentNumbering
 
+
+def _escape_format(text) -> str:
+    """تهريب الأقواس في النصوص الثابتة لاستخدامها داخل قالب str.format"""
+    return str(text).replace('{', '{{').replace('}', '}}')
+
+
+@lru_cache(maxsize=1)
+def _dept_number_formats():
+    """قوالب تنسيق أرقام الأقسام (الأكاديمية، الإدارية) مبنية مرة واحدة من الإعدادات"""
+    settings = DepartmentNumbering.get_settings()
+    width = int(settings['number_width'])
+    academic_fmt = f"{{c:0{width}d}}{_escape_format(settings['separator'])}{{n:0{width}d}}"
+    admin_fmt = (
+        f"{_escape_format(settings['number_prefix'])}"
+        f"{{n:0{width}d}}"
+        f"{_escape_format(settings['number_suffix'])}"
+    )
+    return academic_fmt, admin_fmt
+
+
+@receiver(setting_changed)
+def _clear_dept_number_formats(setting, **kwargs):
+    """مسح قوالب تنسيق أرقام الأقسام عند تغيير إعدادات الترقيم (مثل override_settings)"""
+    if setting == 'DEPARTMENT_NUMBERING_SETTINGS':
+        _dept_number_formats.cache_clear()
+
+
+# نفس تنظيف slugify للنصوص ذات الحروف اللاتينية فقط (حذف الرموز ثم التقسيم عند المسافات والشرطات)
+_CODE_STRIP_RE = re.compile(r'[^\w\s-]')
+_CODE_SPLIT_RE = re.compile(r'[-\s]+')
+
+@lru_cache(maxsize=1024)
 def generate_department_code(name: str, max_length: Optional[int] = None) -> str:
     """توليد اختصار القسم من اسمه
     
@@ -29,7 +65,10 @@ def generate_department_code(name: str, max_length: Optional[int] = None) -> str
         'قع'
     """
     # تنظيف النص وتقسيمه إلى كلمات
-    words = slugify(name).replace('-', ' ').split()
+    if name.isascii():
+        words = _CODE_SPLIT_RE.sub('-', _CODE_STRIP_RE.sub('', name)).strip('-_').split('-')
+    else:
+        words = slugify(name).replace('-', ' ').split()
     
     if not words:
         return ''
@@ -100,26 +139,13 @@ def format_department_number(number: int, college_code: Optional[int] = None, de
         '01'
     """
     settings = DepartmentNumbering.get_settings()
+    academic_fmt, admin_fmt = _dept_number_formats()
     
     if settings['use_prefix'] and college_code and department_type == 'academic':
         # استخدام رقم الكلية كبادئة للقسم الأكاديمي
-        prefix_part = BaseNumberingSystem.format_number(
-            number=college_code,
-            width=settings['number_width']
-        )
-        dept_part = BaseNumberingSystem.format_number(
-            number=number,
-            width=settings['number_width']
-        )
-        return f"{prefix_part}{settings['separator']}{dept_part}"
-    else:
-        # ترقيم مستقل للأقسام الإدارية
-        return BaseNumberingSystem.format_number(
-            number=number,
-            width=settings['number_width'],
-            prefix=settings['number_prefix'],
-            suffix=settings['number_suffix']
-        )
+        return academic_fmt.format(c=int(college_code), n=int(number))
+    # ترقيم مستقل للأقسام الإدارية
+    return admin_fmt.format(n=int(number))
 
 def validate_department_number(number: int) -> None:
     """التحقق من صحة رقم القسم
@@ -162,28 +188,133 @@ def get_unique_department_code(model_class: Type[models.Model], name: str, max_l
     # توليد الاختصار الأساسي
     base_code = generate_department_code(name, max_length=max_length)
     
-    # البحث عن الاختصارات المشابهة
+    # البحث عن الاختصارات التي تبدأ بالاختصار الأساسي (يستخدم فهرس الحقل)
     similar_codes = model_class.objects.filter(
-        code__regex=f"^{base_code}[0-9]*$"
-    ).annotate(
-        # استخراج الرقم من نهاية الاختصار
-        number=Cast(
-            RegexpReplace(F('code'), f"^{base_code}", ''),
-            models.IntegerField(),
-            null=True
-        )
-    ).aggregate(
-        # الحصول على أعلى رقم
-        max_number=Max('number')
-    )
+        code__startswith=base_code
+    ).values_list('code', flat=True)
     
-    # إذا لم يكن هناك اختصار مشابه، نستخدم الاختصار الأساسي
-    if not similar_codes['max_number']:
+    # استخراج الأرقام من نهاية الاختصارات المشابهة
+    base_length = len(base_code)
+    used_base = False
+    max_number = 0
+    for code in similar_codes:
+        suffix = code[base_length:]
+        if not suffix:
+            used_base = True
+        elif suffix.isdigit():
+            max_number = max(max_number, int(suffix))
+    
+    # إذا لم يكن الاختصار الأساسي مستخدماً، نستخدمه
+    if not used_base:
         return base_code
         
     # إضافة رقم جديد للاختصار
-    next_number = similar_codes['max_number'] + 1
-    return f"{base_code}{next_number}"
+    return f"{base_code}{max_number + 1}"
+
+def pick_unique_department_code(name: str, existing_codes: set, max_length: int = 10) -> str:
+    """توليد اختصار فريد للقسم من مجموعة اختصارات محملة مسبقاً (دون استعلام)
+    
+    يستخدم عند إنشاء عدة أقسام دفعة واحدة، حيث يتم جلب الاختصارات الموجودة مرة واحدة.
+    
+    Args:
+        name: اسم القسم
+        existing_codes: مجموعة الاختصارات المستخدمة
+        max_length: الحد الأقصى لطول الاختصار
+        
+    Returns:
+        str: اختصار فريد للقسم
+        
+    Examples:
+        >>> pick_unique_department_code("Department of Computer Science", {'DCS'})
+        'DCS1'
+    """
+    base_code = generate_department_code(name, max_length=max_length)
+    
+    if base_code not in existing_codes:
+        return base_code
+    
+    number = 1
+    while f"{base_code}{number}" in existing_codes:
+        number += 1
+    return f"{base_code}{number}"
+
+def build_adjacency(edges) -> dict:
+    """بناء قائمة تجاور من أزواج (مصدر، هدف)
+    
+    Args:
+        edges: أزواج (معرف المصدر، معرف الهدف)
+        
+    Returns:
+        dict: قاموس {معرف: قائمة بمعرفات الأهداف}
+    """
+    adjacency = {}
+    for source_id, target_id in edges:
+        adjacency.setdefault(source_id, []).append(target_id)
+    return adjacency
+
+def reachable_from(adjacency: dict, start) -> set:
+    """جميع العقد التي يمكن الوصول إليها من عقدة (بحث تكراري دون استدعاء ذاتي)
+    
+    لا تتضمن النتيجة عقدة البداية إلا إذا كانت ضمن دورة.
+    
+    Args:
+        adjacency: قائمة التجاور
+        start: عقدة البداية
+        
+    Returns:
+        set: العقد التي يمكن الوصول إليها
+    """
+    reached = set()
+    stack = list(adjacency.get(start, ()))
+    while stack:
+        node = stack.pop()
+        if node not in reached:
+            reached.add(node)
+            stack.extend(adjacency.get(node, ()))
+    return reached
+
+def topological_order(adjacency: dict) -> Optional[list]:
+    """ترتيب العقد بحيث تأتي كل عقدة بعد العقد التي تشير إليها (خوارزمية Kahn)
+    
+    في رسم المتطلبات السابقة تأتي المتطلبات قبل المقررات التي تتطلبها.
+    
+    Args:
+        adjacency: قائمة التجاور
+        
+    Returns:
+        Optional[list]: العقد مرتبة، أو None إذا كان الرسم يحتوي على دورة
+    """
+    nodes = set(adjacency)
+    for targets in adjacency.values():
+        nodes.update(targets)
+    
+    # عدد العقد التي تشير إليها كل عقدة ولم تُرتب بعد
+    pending = {node: len(adjacency.get(node, ())) for node in nodes}
+    dependents = build_adjacency(
+        (target, source) for source, targets in adjacency.items() for target in targets
+    )
+    
+    ready = [node for node, count in pending.items() if count == 0]
+    order = []
+    while ready:
+        node = ready.pop()
+        order.append(node)
+        for dependent in dependents.get(node, ()):
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+    
+    return order if len(order) == len(nodes) else None
+
+# تاريخ اليوم المنسق لمسارات الصور (يعاد تنسيقه فقط عند تغير اليوم)
+_DATE_CACHE = {'day': None, 'str': ''}
+
+def _today_str() -> str:
+    """تاريخ اليوم بصيغة YYYY_MM_DD"""
+    today = datetime.date.today()
+    if _DATE_CACHE['day'] != today:
+        _DATE_CACHE.update(day=today, str=today.strftime("%Y_%m_%d"))
+    return _DATE_CACHE['str']
 
 # function for department image path
 def department_image_path(instance, filename):
@@ -191,7 +322,7 @@ def department_image_path(instance, filename):
     department_slug = slugify(instance.name)
     college_slug = slugify(instance.college.name)
     # الحصول على تاريخ اليوم بصيغة معينة
-    date_str = datetime.datetime.now().strftime("%Y_%m_%d")
+    date_str = _today_str()
     # دمج مسار الملف مع مسار المجلد
     full_path = os.path.join('colleges', college_slug, department_slug,'images', date_str, filename)
     return full_path
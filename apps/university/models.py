@@ -1,15 +1,32 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
-from django.db.models import Max
-from .utils import generate_college_number, format_college_number, validate_college_number
+from django.db.models import Max, Q, Value, Case, When, Prefetch
+from django.db.models.functions import Cast, Concat, LPad
+from .utils import (
+    generate_college_number,
+    generate_college_numbers,
+    format_college_number
+)
 from apps.core.numbering import BaseNumberingSystem, CollegeNumbering
 
+class UniversityManager(models.Manager):
+    """مدير الجامعات"""
+    
+    def with_details(self):
+        """الجامعات مع تفاصيلها (استعلامان بدلاً من استعلام لكل جامعة)"""
+        return self.get_queryset().prefetch_related(
+            Prefetch('details', queryset=UniversityDetail.objects.only('id', 'title', 'subtitle', 'university_id'))
+        )
+
+
 class University(models.Model):
     name = models.CharField(max_length=255, verbose_name=_("University Name"))
     description = models.TextField(blank=True, null=True, verbose_name=_("University Description"))
     location = models.CharField(max_length=255, verbose_name=_("University Location"))
 
+    objects = UniversityManager()
+
     class Meta:
         verbose_name = _("University")
         verbose_name_plural = _("Universities")
@@ -25,6 +42,59 @@ class UniversityDetail(models.Model):
     def __str__(self):
         return f"{self.title}"
 
+# إعدادات ترقيم الكليات عند تحميل النماذج (لقيد نطاق الأرقام والرقم المنسق)
+_COLLEGE_NUMBERING = CollegeNumbering.get_settings()
+
+
+def _formatted_college_code_expression():
+    """تعبير قاعدة البيانات المقابل لـ format_college_number (البادئة + الرقم بعرض ثابت + اللاحقة)"""
+    width = int(_COLLEGE_NUMBERING['number_width'])
+    code_text = Cast('code', output_field=models.CharField())
+    return Concat(
+        Value(_COLLEGE_NUMBERING['number_prefix']),
+        # LPAD يقتطع الأرقام الأطول من العرض، لذلك تستخدم كما هي
+        Case(
+            When(code__gte=10 ** width, then=code_text),
+            default=LPad(code_text, width, Value('0')),
+        ),
+        Value(_COLLEGE_NUMBERING['number_suffix']),
+        output_field=models.CharField(),
+    )
+
+
+class CollegeManager(models.Manager):
+    """مدير الكليات"""
+    
+    def bulk_create_with_codes(self, colleges, **kwargs):
+        """
+        إنشاء عدة كليات دفعة واحدة مع توليد أرقامها
+        
+        يتم حجز أرقام الكليات الجديدة مرة واحدة ثم إدراجها بعملية bulk_create واحدة
+        (دون المرور على save لكل كلية).
+        
+        :param colleges: الكليات المراد إنشاؤها
+        :return: قائمة بالكليات التي تم إنشاؤها
+        """
+        colleges = list(colleges)
+        without_code = [college for college in colleges if not college.code]
+        for college, code in zip(without_code, generate_college_numbers(self.model, len(without_code))):
+            college.code = code
+        return self.bulk_create(colleges, **kwargs)
+    
+    def ordered(self):
+        """الكليات مرتبة حسب الرقم (يستخدم الفهرس الفريد لحقل code)"""
+        return self.get_queryset().order_by('code')
+    
+    def with_details(self):
+        """الكليات مع تفاصيلها (استعلامان بدلاً من استعلام لكل كلية)
+        
+        يجب استخدامها في العروض التي تعرض تفاصيل عدة كليات
+        """
+        return self.get_queryset().prefetch_related(
+            Prefetch('details', queryset=CollegeDetail.objects.only('id', 'title', 'subtitle', 'college_id'))
+        )
+
+
 #نموذج الكليات الدراسية الخاصة بالجامعة
 class College(models.Model):
     code = models.IntegerField(
@@ -33,6 +103,12 @@ class College(models.Model):
         editable=False,  # لمنع التعديل اليدوي
         help_text=_("Unique numeric identifier for the college")
     )
+    formatted_code = models.GeneratedField(
+        expression=_formatted_college_code_expression(),
+        output_field=models.CharField(max_length=32),
+        db_persisted=True,
+        verbose_name=_("Formatted College Code")
+    )
     name = models.CharField(
         max_length=255,
         verbose_name=_("College Name"),
@@ -45,27 +121,35 @@ class College(models.Model):
         help_text=_("Detailed description of the college")
     )
     
+    objects = CollegeManager()
+    
     class Meta:
         verbose_name = _("College")
         verbose_name_plural = _("Colleges")
-        ordering = ['code']
+        # لا يوجد ترتيب افتراضي (استخدم College.objects.ordered() عند الحاجة للترتيب)
+        constraints = [
+            # نطاق أرقام الكليات تفرضه قاعدة البيانات (بدلاً من التحقق في clean وsave)
+            models.CheckConstraint(
+                condition=Q(code__gte=_COLLEGE_NUMBERING['min_number']) & Q(code__lte=_COLLEGE_NUMBERING['max_number']),
+                name='college_code_range'
+            ),
+        ]
         indexes = [
-            models.Index(fields=['code', 'name'], name='college_code_name_idx'),
+            # code فريد وله فهرسه الخاص
+            models.Index(fields=['name'], name='college_name_idx'),
         ]
 
     def save(self, *args, **kwargs):
-        if not self.code:
+        if self._state.adding and not self.code:
             # توليد رقم الكلية إذا كان جديداً
-            self.code = generate_college_number(self.__class__)
+            self.code = generate_college_number(type(self))
         super().save(*args, **kwargs)
 
     def clean(self):
         """التحقق من صحة البيانات"""
         super().clean()
         
-        # التحقق من الرقم
-        if self.code:
-            validate_college_number(self.code)
+        # نطاق الرقم يتم التحقق منه بقيد college_code_range
 
         if not self.name or not self.name.strip():
             raise ValidationError({
@@ -73,7 +157,11 @@ class College(models.Model):
             })
 
     def __str__(self):
-        return f"{self.format_code()} - {self.name}"
+        # استخدام الرقم المنسق المخزن إن كان محملاً (لا يتوفر قبل الحفظ)
+        formatted_code = self.__dict__.get('formatted_code')
+        if formatted_code is None:
+            formatted_code = self.format_code()
+        return f"{formatted_code} - {self.name}"
 
     def format_code(self) -> str:
         """تنسيق رقم الكلية"""
@@ -81,6 +169,56 @@ class College(models.Model):
             return ''
         return format_college_number(self.code)
 
+class CollegeCounter(models.Model):
+    """عداد أرقام الكليات (صف واحد)"""
+    
+    last_number = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Last Number")
+    )
+
+    class Meta:
+        verbose_name = _("College Counter")
+        verbose_name_plural = _("College Counters")
+
+    def __str__(self):
+        return str(self.last_number)
+
+    @classmethod
+    def reserve(cls, count=1):
+        """
+        حجز أرقام كليات جديدة بشكل ذري
+        
+        يتم قفل صف العداد (select_for_update) بدلاً من حساب أعلى رقم (Max) في جدول
+        الكليات عند كل إضافة. عند إنشاء العداد لأول مرة يبدأ من أعلى رقم مستخدم.
+        
+        :param count: عدد الأرقام المطلوب حجزها (اختياري)
+        :return: أول رقم محجوز
+        """
+        settings = CollegeNumbering.get_settings()
+        
+        def current_max():
+            max_number = College.objects.aggregate(max_number=Max('code'))['max_number']
+            return max_number if max_number is not None else settings['min_number'] - 1
+        
+        with transaction.atomic():
+            counter, _created = cls.objects.select_for_update().get_or_create(
+                pk=1,
+                defaults={'last_number': current_max}
+            )
+            
+            first_number = counter.last_number + 1
+            last_number = counter.last_number + count
+            if last_number > settings['max_number']:
+                raise ValidationError({
+                    'code': _('Maximum number of colleges has been reached')
+                })
+            
+            counter.last_number = last_number
+            counter.save(update_fields=['last_number'])
+        
+        return first_number
+
 #نموذج تفاصيل الكلية 
 class CollegeDetail(models.Model):
     college = models.ForeignKey(College, on_delete=models.CASCADE, related_name='details', verbose_name=_("College"))
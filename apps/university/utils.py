@@ -21,13 +21,50 @@ __all__ = [
 تحتوي على دوال مساعدة مثل توليد وتنسيق الأرقام
 """
 
+from functools import lru_cache
 from typing import Type, Any
 from django.db import models
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from apps.core.numbering import BaseNumberingSystem, CollegeNumbering
 
+
+@lru_cache(maxsize=1)
+def _college_numbering_settings():
+    """إعدادات ترقيم الكليات (مخزنة مؤقتاً على مستوى العملية)"""
+    return CollegeNumbering.get_settings()
+
+
+@lru_cache(maxsize=1)
+def _college_number_formatter():
+    """دالة تنسيق رقم الكلية مبنية مرة واحدة من الإعدادات (العرض والبادئة واللاحقة ثابتة)"""
+    settings = _college_numbering_settings()
+    width = int(settings['number_width'])
+    prefix = settings['number_prefix']
+    suffix = settings['number_suffix']
+    
+    def format_number(number):
+        return f"{prefix}{number:0{width}d}{suffix}"
+    
+    return format_number
+
+
+@receiver(setting_changed)
+def _clear_college_numbering_settings(setting, **kwargs):
+    """مسح إعدادات ترقيم الكليات المخزنة عند تغييرها (مثل override_settings)"""
+    if setting == 'COLLEGE_NUMBERING_SETTINGS':
+        _college_numbering_settings.cache_clear()
+        _college_number_formatter.cache_clear()
+
+
 def generate_college_number(model_class: Type[models.Model]) -> int:
     """توليد رقم الكلية تلقائياً
     
+    يتم حجز الرقم من عداد الكليات (CollegeCounter) بدلاً من حساب أعلى رقم
+    في جدول الكليات عند كل إضافة.
+    
     Args:
         model_class: نموذج الكلية
         
@@ -37,16 +74,29 @@ def generate_college_number(model_class: Type[models.Model]) -> int:
     Raises:
         ValidationError: إذا تم تجاوز الحد الأقصى للكليات
     """
-    settings = CollegeNumbering.get_settings()
+    from .models import CollegeCounter
     
-    next_number = BaseNumberingSystem.get_next_sequence(
-        model=model_class,
-        field_name='code',
-        min_val=settings['min_number'],
-        max_val=settings['max_number']
-    )
+    return CollegeCounter.reserve()
+
+def generate_college_numbers(model_class: Type[models.Model], n: int) -> range:
+    """حجز مجموعة متتالية من أرقام الكليات دفعة واحدة
+    
+    Args:
+        model_class: نموذج الكلية
+        n: عدد الأرقام المطلوبة
+        
+    Returns:
+        range: أرقام الكليات المحجوزة
+        
+    Raises:
+        ValidationError: إذا تم تجاوز الحد الأقصى للكليات
+    """
+    from .models import CollegeCounter
     
-    return next_number
+    if n <= 0:
+        return range(0)
+    first_number = CollegeCounter.reserve(count=n)
+    return range(first_number, first_number + n)
 
 def format_college_number(number: int) -> str:
     """تنسيق رقم الكلية
@@ -63,13 +113,7 @@ def format_college_number(number: int) -> str:
         >>> format_college_number(12)
         '12'
     """
-    settings = CollegeNumbering.get_settings()
-    return BaseNumberingSystem.format_number(
-        number=number,
-        width=settings['number_width'],
-        prefix=settings['number_prefix'],
-        suffix=settings['number_suffix']
-    )
+    return _college_number_formatter()(int(number))
 
 def validate_college_number(number: int) -> None:
     """التحقق من صحة رقم الكلية
@@ -80,10 +124,12 @@ def validate_college_number(number: int) -> None:
     Raises:
         ValidationError: إذا كان الرقم خارج النطاق المسموح به
     """
-    settings = CollegeNumbering.get_settings()
-    BaseNumberingSystem.validate_range(
-        number=number,
-        min_val=settings['min_number'],
-        max_val=settings['max_number'],
-        field_name='code'
-    )
\ No newline at end of file
+    settings = _college_numbering_settings()
+    min_number, max_number = settings['min_number'], settings['max_number']
+    if not min_number <= number <= max_number:
+        raise ValidationError({
+            'code': _('College number must be between %(min)s and %(max)s') % {
+                'min': min_number,
+                'max': max_number
+            }
+        })
\ No newline at end of file
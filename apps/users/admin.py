@@ -4,8 +4,13 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+from django.db.models import Value, prefetch_related_objects
+from django.db.models.functions import Concat, Trim
 
 from .models import (
     User, UserProfile, Role, UserRole,
@@ -39,6 +44,20 @@ class UserRoleInline(admin.TabularInline):
     fk_name = 'user'
 
 
+class UserFullNameAdminMixin:
+    """عرض الاسم الكامل للمستخدم المرتبط محسوباً في قاعدة البيانات مع استعلام القائمة"""
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').annotate(
+            _full_name=Trim(Concat('user__first_name', Value(' '), 'user__last_name'))
+        )
+    
+    def get_full_name(self, obj):
+        return obj._full_name
+    get_full_name.short_description = _('Full Name')
+    get_full_name.admin_order_field = '_full_name'
+
+
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     form = CustomUserChangeForm
@@ -59,11 +78,35 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
     
-    list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active')
+    list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active', 'profile_tab')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'gender')
     search_fields = ('email', 'username', 'first_name', 'last_name', 'national_id')
     ordering = ('email',)
     inlines = (UserProfileInline, UserRoleInline)
+    # المجموعات عبر البحث بدلاً من عرض جميع الخيارات (الصلاحيات غير مسجلة في الإدارة)
+    autocomplete_fields = ('groups',)
+    filter_horizontal = ('user_permissions',)
+    
+    # تبويب الملف الشخصي والأدوار (يتم تحميل الجداول المضمنة عند طلبها فقط)
+    PROFILE_TAB = 'profile'
+    
+    def get_inlines(self, request, obj=None):
+        # صفحة الإضافة تعرض الجداول المضمنة دائماً
+        if obj is None or request.GET.get('tab') == self.PROFILE_TAB:
+            return super().get_inlines(request, obj)
+        return ()
+    
+    def profile_tab(self, obj):
+        url = reverse('admin:users_user_change', args=(obj.pk,))
+        return format_html('<a href="{}?tab={}">{}</a>', url, self.PROFILE_TAB, _('Profile & Roles'))
+    profile_tab.short_description = _('Profile & Roles')
+    
+    def get_object(self, request, object_id, from_field=None):
+        # المجموعات والصلاحيات تعرض في صفحة التعديل فقط (وليس في قائمة المستخدمين)
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            prefetch_related_objects([obj], 'groups', 'user_permissions')
+        return obj
 
 
 @admin.register(Role)
@@ -71,6 +114,7 @@ class RoleAdmin(admin.ModelAdmin):
     list_display = ('name', 'description')
     search_fields = ('name', 'description')
     filter_horizontal = ('permissions',)
+    ordering = ('name',)
 
 
 @admin.register(UserRole)
@@ -78,37 +122,39 @@ class UserRoleAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'assigned_date', 'assigned_by')
     list_filter = ('role', 'assigned_date')
     search_fields = ('user__username', 'user__email', 'role__name')
-    raw_id_fields = ('user', 'role', 'assigned_by')
+    autocomplete_fields = ('user', 'role', 'assigned_by')
+    list_select_related = ('user', 'role', 'assigned_by')
     date_hierarchy = 'assigned_date'
 
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(UserFullNameAdminMixin, admin.ModelAdmin):
     list_display = ('student_id', 'get_full_name', 'status', 'admission_date', 'cgpa', 'total_credits_earned')
     list_filter = ('status', 'admission_date')
     search_fields = ('student_id', 'user__username', 'user__first_name', 'user__last_name', 'user__email')
-    raw_id_fields = ('user',)
+    autocomplete_fields = ('user',)
+    list_select_related = ('user',)
     date_hierarchy = 'admission_date'
+    ordering = ('student_id',)
     
     fieldsets = (
         (None, {'fields': ('user', 'student_id', 'status', 'admission_date')}),
         (_('Academic Information'), {'fields': ('cgpa', 'total_credits_earned')}),
         (_('Emergency Contact'), {'fields': ('emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship')}),
     )
-    
-    def get_full_name(self, obj):
-        return obj.user.get_full_name()
-    get_full_name.short_description = _('Full Name')
-    get_full_name.admin_order_field = 'user__first_name'
 
 
 @admin.register(FacultyMember)
-class FacultyMemberAdmin(admin.ModelAdmin):
+class FacultyMemberAdmin(UserFullNameAdminMixin, admin.ModelAdmin):
     list_display = ('faculty_id', 'get_full_name', 'rank', 'department', 'status', 'hire_date')
     list_filter = ('status', 'rank', 'department', 'hire_date')
     search_fields = ('faculty_id', 'user__username', 'user__first_name', 'user__last_name', 'user__email', 'specialization')
-    raw_id_fields = ('user', 'department')
+    autocomplete_fields = ('user',)
+    # الأقسام غير مسجلة في الإدارة (لا يمكن استخدام البحث التلقائي)
+    raw_id_fields = ('department',)
+    list_select_related = ('user', 'department__college')
     date_hierarchy = 'hire_date'
+    ordering = ('faculty_id',)
     
     fieldsets = (
         (None, {'fields': ('user', 'faculty_id', 'status', 'rank', 'department', 'hire_date')}),
@@ -116,30 +162,23 @@ class FacultyMemberAdmin(admin.ModelAdmin):
         (_('Office Information'), {'fields': ('office_location', 'office_hours')}),
         (_('Biography'), {'fields': ('biography',)}),
     )
-    
-    def get_full_name(self, obj):
-        return obj.user.get_full_name()
-    get_full_name.short_description = _('Full Name')
-    get_full_name.admin_order_field = 'user__first_name'
 
 
 @admin.register(StaffMember)
-class StaffMemberAdmin(admin.ModelAdmin):
+class StaffMemberAdmin(UserFullNameAdminMixin, admin.ModelAdmin):
     list_display = ('staff_id', 'get_full_name', 'job_title', 'department', 'status', 'hire_date')
     list_filter = ('status', 'department', 'hire_date')
     search_fields = ('staff_id', 'user__username', 'user__first_name', 'user__last_name', 'user__email', 'job_title')
-    raw_id_fields = ('user', 'department', 'supervisor')
+    autocomplete_fields = ('user', 'supervisor')
+    raw_id_fields = ('department',)
+    list_select_related = ('user', 'department__college')
     date_hierarchy = 'hire_date'
+    ordering = ('staff_id',)
     
     fieldsets = (
         (None, {'fields': ('user', 'staff_id', 'status', 'job_title', 'department', 'hire_date')}),
         (_('Work Information'), {'fields': ('supervisor', 'office_location', 'work_schedule')}),
     )
-    
-    def get_full_name(self, obj):
-        return obj.user.get_full_name()
-    get_full_name.short_description = _('Full Name')
-    get_full_name.admin_order_field = 'user__first_name'
 
 
 @admin.register(UserLog)
@@ -147,8 +186,9 @@ class UserLogAdmin(admin.ModelAdmin):
     list_display = ('user', 'log_type', 'timestamp', 'ip_address')
     list_filter = ('log_type', 'timestamp')
     search_fields = ('user__username', 'user__email', 'ip_address')
+    list_select_related = ('user',)
     date_hierarchy = 'timestamp'
-    readonly_fields = ('user', 'log_type', 'timestamp', 'ip_address', 'user_agent', 'details')
+    readonly_fields = ('user', 'log_type', 'timestamp', 'ip_address', 'user_agent', 'session_key', 'reason', 'details')
 
 
 @admin.register(Notification)
@@ -156,6 +196,8 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'title', 'notification_type', 'priority', 'created_at', 'read')
     list_filter = ('notification_type', 'priority', 'read', 'created_at')
     search_fields = ('user__username', 'user__email', 'title', 'message')
+    list_select_related = ('user', 'sender')
+    autocomplete_fields = ('user', 'sender')
     date_hierarchy = 'created_at'
     readonly_fields = ('created_at', 'read_at')
     
@@ -168,17 +210,12 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread']
     
     def mark_as_read(self, request, queryset):
-        updated = 0
-        for notification in queryset:
-            if notification.mark_as_read():
-                updated += 1
+        # تحديث جماعي واحد بدلاً من حفظ كل إشعار على حدة
+        updated = queryset.filter(read=False).update(read=True, read_at=timezone.now())
         self.message_user(request, _('%(count)d notifications marked as read.') % {'count': updated})
     mark_as_read.short_description = _('Mark selected notifications as read')
     
     def mark_as_unread(self, request, queryset):
-        updated = 0
-        for notification in queryset:
-            if notification.mark_as_unread():
-                updated += 1
+        updated = queryset.filter(read=True).update(read=False, read_at=None)
         self.message_user(request, _('%(count)d notifications marked as unread.') % {'count': updated})
     mark_as_unread.short_description = _('Mark selected notifications as unread')
@@ -1,6 +1,10 @@
+import logging
+
 from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 
+logger = logging.getLogger(__name__)
+
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -8,7 +12,9 @@ class UsersConfig(AppConfig):
     verbose_name = _('Users Management')
     
     def ready(self):
+        # الإشارات خفيفة (تعتمد على Django فقط) ويجب تسجيلها قبل أي حفظ للمستخدمين،
+        # بما في ذلك أوامر الإدارة مثل migrate وcreatesuperuser
         try:
             import apps.users.signals
         except ImportError:
-            pass
+            logger.warning("Could not import apps.users.signals; user signal handlers are disabled", exc_info=True)
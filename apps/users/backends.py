@@ -0,0 +1,33 @@
+"""
+خلفيات المصادقة لتطبيق المستخدمين
+"""
+
+from django.contrib.auth.backends import ModelBackend
+
+from .perm_cache import get_user_perms
+
+
+class RolePermissionBackend(ModelBackend):
+    """
+    خلفية ModelBackend مع إضافة الصلاحيات الممنوحة عبر أدوار المستخدم (UserRole)
+
+    صلاحيات الأدوار تقرأ من الذاكرة المؤقتة المشتركة (perm_cache) بدلاً من ربط
+    جداول UserRole وRole والصلاحيات عند كل طلب، وتخزن على كائن المستخدم
+    حتى لا تتكرر القراءة خلال نفس الطلب.
+    """
+
+    def get_role_permissions(self, user_obj, obj=None):
+        """صلاحيات المستخدم الممنوحة عبر أدواره"""
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_role_perm_cache'):
+            user_obj._role_perm_cache = get_user_perms(user_obj.pk)
+        return user_obj._role_perm_cache
+
+    def get_all_permissions(self, user_obj, obj=None):
+        """صلاحيات المستخدم المباشرة وصلاحيات مجموعاته وأدواره"""
+        permissions = super().get_all_permissions(user_obj, obj)
+        role_permissions = self.get_role_permissions(user_obj, obj)
+        if not role_permissions:
+            return permissions
+        return {*permissions, *role_permissions}
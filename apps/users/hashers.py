@@ -0,0 +1,13 @@
+"""
+خوارزميات تشفير كلمات المرور
+"""
+
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id بإعدادات OWASP الموصى بها (ذاكرة 46 ميجابايت، تكرار واحد، مسار واحد)"""
+    
+    time_cost = 1
+    memory_cost = 46 * 1024  # بالكيلوبايت
+    parallelism = 1
@@ -2,14 +2,28 @@
 نماذج إدارة المستخدمين في النظام
 """
 
-from django.db import models
+from django.apps import apps
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
+from django.contrib.auth.hashers import make_password
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.validators import RegexValidator, MinLengthValidator
 from django.conf import settings
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.db.models.functions import Coalesce, Now, Round
+from concurrent.futures import ThreadPoolExecutor
+import re
 import uuid
 
+# تنسيق رقم الهاتف (يستخدم في مصادقة حقول الهاتف)
+PHONE_RE = re.compile(r'^\+?1?\d{9,15}$')
+
+
+def _student_grade_model():
+    """نموذج درجات الطلاب من سجل التطبيقات (بدون استيراد دائري مع تطبيق academic)"""
+    return apps.get_model('academic', 'StudentGrade')
+
 
 class UserManager(BaseUserManager):
     """مدير النموذج المخصص للمستخدمين"""
@@ -24,6 +38,45 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
     
+    def bulk_create_users(self, rows, batch_size=500, hash_workers=8):
+        """
+        إنشاء عدة مستخدمين دفعة واحدة (للاستيراد الجماعي للطلاب وأعضاء هيئة التدريس)
+        
+        كل صف عبارة عن قاموس يحتوي على email و password وقاموس اختياري extra
+        لبقية الحقول (username و first_name ...). يتم تجاهل الصفوف التي يوجد
+        بريدها الإلكتروني مسبقاً، وتشفير كلمات المرور بالتوازي (مكتبة argon2
+        تحرر GIL أثناء التشفير) ثم الإدراج بعملية INSERT متعددة الصفوف.
+        
+        bulk_create لا يرسل إشارة post_save، لذلك يتم إنشاء الملفات الشخصية
+        في نفس المعاملة. تعيد قائمة المستخدمين الذين تم إنشاؤهم.
+        """
+        pending = {}
+        for row in rows:
+            if not row.get('email'):
+                raise ValueError(_('The Email field must be set'))
+            pending.setdefault(self.normalize_email(row['email']), row)
+        
+        existing = set(self.filter(email__in=pending).values_list('email', flat=True))
+        pending = {email: row for email, row in pending.items() if email not in existing}
+        if not pending:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=hash_workers) as executor:
+            passwords = list(executor.map(make_password, [row.get('password') for row in pending.values()]))
+        
+        users = [
+            self.model(email=email, password=password, **row.get('extra', {}))
+            for (email, row), password in zip(pending.items(), passwords)
+        ]
+        with transaction.atomic(using=self._db):
+            users = self.bulk_create(users, batch_size=batch_size)
+            UserProfile.objects.using(self._db).bulk_create(
+                [UserProfile(user=user) for user in users],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        return users
+    
     def create_superuser(self, email, password=None, **extra_fields):
         """إنشاء وحفظ مستخدم مشرف جديد"""
         extra_fields.setdefault('is_staff', True)
@@ -48,7 +101,7 @@ class User(AbstractUser):
     
     # تعريف المصادقات للحقول
     phone_regex = RegexValidator(
-        regex=r'^\+?1?\d{9,15}$',
+        regex=PHONE_RE,
         message=_("Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.")
     )
     
@@ -103,7 +156,7 @@ class User(AbstractUser):
         default=True,
         help_text=_('Designates whether this user should be treated as active.'),
     )
-    date_joined = models.DateTimeField(_('Date Joined'), default=timezone.now)
+    date_joined = models.DateTimeField(_('Date Joined'), db_default=Now())
     last_login_ip = models.GenericIPAddressField(_('Last Login IP'), blank=True, null=True)
     
     # تعيين حقل البريد الإلكتروني كحقل تسجيل الدخول
@@ -116,7 +169,14 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _('User')
         verbose_name_plural = _('Users')
-        ordering = ['username']
+        indexes = [
+            # فهارس trigram لتسريع بحث الإدارة بالنصوص الجزئية (icontains)
+            GinIndex(
+                fields=['email', 'username', 'first_name', 'last_name', 'national_id'],
+                opclasses=['gin_trgm_ops'] * 5,
+                name='user_search_trgm_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.username})"
@@ -180,7 +240,6 @@ class Role(models.Model):
     class Meta:
         verbose_name = _('Role')
         verbose_name_plural = _('Roles')
-        ordering = ['name']
     
     def __str__(self):
         return self.name
@@ -297,52 +356,60 @@ class Student(models.Model):
     class Meta:
         verbose_name = _('Student')
         verbose_name_plural = _('Students')
-        ordering = ['student_id']
+        indexes = [
+            models.Index(fields=['status', '-admission_date'], name='student_status_admission_idx'),
+            GinIndex(fields=['student_id'], opclasses=['gin_trgm_ops'], name='student_id_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} ({self.student_id})"
     
     def update_cgpa(self):
-        """تحديث المعدل التراكمي للطالب"""
-        from apps.academic.models import StudentGrade
-        
-        grades = StudentGrade.objects.filter(
-            student=self,
-            grade__isnull=False
-        )
-        
-        if not grades.exists():
-            return 0.0
+        """تحديث المعدل التراكمي للطالب
         
-        total_points = 0
-        total_credits = 0
-        
-        for grade in grades:
-            total_points += grade.grade_points * grade.course.credit_hours
-            total_credits += grade.course.credit_hours
+        يحسب المعدل ويحفظ في قاعدة البيانات بعملية UPDATE واحدة (ذرية)؛
+        يتم تحميل القيمة الجديدة عند الوصول إلى cgpa.
+        """
+        StudentGrade = _student_grade_model()
         
-        if total_credits > 0:
-            self.cgpa = round(total_points / total_credits, 2)
-        else:
-            self.cgpa = 0.0
+        # المعدل = مجموع (النقاط × الساعات) / مجموع الساعات
+        cgpa = StudentGrade.objects.filter(
+            student=models.OuterRef('pk'),
+            grade__isnull=False
+        ).values('student').annotate(
+            cgpa=Round(
+                models.Sum(
+                    models.F('grade_points') * models.F('course__credits'),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2)
+                ) / models.Sum('course__credits'),
+                2
+            )
+        ).values('cgpa')
         
-        self.save(update_fields=['cgpa'])
-        return self.cgpa
+        Student.objects.filter(pk=self.pk).update(
+            cgpa=Coalesce(models.Subquery(cgpa), 0, output_field=models.DecimalField(max_digits=3, decimal_places=2))
+        )
+        self.__dict__.pop('cgpa', None)
     
     def update_credits_earned(self):
-        """تحديث عدد الساعات المكتسبة"""
-        from apps.academic.models import StudentGrade
+        """تحديث عدد الساعات المكتسبة
+        
+        يحسب المجموع ويحفظ في قاعدة البيانات بعملية UPDATE واحدة (ذرية)؛
+        يتم تحميل القيمة الجديدة عند الوصول إلى total_credits_earned.
+        """
+        StudentGrade = _student_grade_model()
         
         credits = StudentGrade.objects.filter(
-            student=self,
+            student=models.OuterRef('pk'),
             grade__is_passing=True
-        ).aggregate(
-            total=models.Sum('course__credit_hours')
-        )['total'] or 0
+        ).values('student').annotate(
+            total=models.Sum('course__credits')
+        ).values('total')
         
-        self.total_credits_earned = credits
-        self.save(update_fields=['total_credits_earned'])
-        return self.total_credits_earned
+        Student.objects.filter(pk=self.pk).update(
+            total_credits_earned=Coalesce(models.Subquery(credits), 0)
+        )
+        self.__dict__.pop('total_credits_earned', None)
 
 
 class FacultyMember(models.Model):
@@ -447,7 +514,9 @@ class FacultyMember(models.Model):
     class Meta:
         verbose_name = _('Faculty Member')
         verbose_name_plural = _('Faculty Members')
-        ordering = ['faculty_id']
+        indexes = [
+            GinIndex(fields=['faculty_id'], opclasses=['gin_trgm_ops'], name='faculty_id_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_rank_display()} {self.user.get_full_name()} ({self.faculty_id})"
@@ -539,7 +608,9 @@ class StaffMember(models.Model):
     class Meta:
         verbose_name = _('Staff Member')
         verbose_name_plural = _('Staff Members')
-        ordering = ['staff_id']
+        indexes = [
+            GinIndex(fields=['staff_id'], opclasses=['gin_trgm_ops'], name='staff_id_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.job_title} ({self.staff_id})"
@@ -571,7 +642,8 @@ class UserLog(models.Model):
         choices=LOG_TYPES
     )
     
-    timestamp = models.DateTimeField(_('Timestamp'), auto_now_add=True)
+    # وقت الحدث نفسه (قد يتم إدراج السجل لاحقاً من طابور السجلات)
+    timestamp = models.DateTimeField(_('Timestamp'), db_default=Now(), editable=False)
     
     ip_address = models.GenericIPAddressField(
         _('IP Address'),
@@ -581,12 +653,29 @@ class UserLog(models.Model):
     
     user_agent = models.TextField(_('User Agent'), blank=True, null=True)
     
+    session_key = models.CharField(
+        _('Session Key'),
+        max_length=40,
+        blank=True,
+        null=True,
+        db_index=True
+    )
+    
+    reason = models.CharField(_('Reason'), max_length=100, blank=True, null=True)
+    
+    # بيانات إضافية للأحداث النادرة فقط (الحقول الشائعة لها أعمدة خاصة)
     details = models.JSONField(_('Details'), blank=True, null=True)
     
     class Meta:
         verbose_name = _('User Log')
         verbose_name_plural = _('User Logs')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['log_type', '-timestamp'], name='userlog_type_time_idx'),
+            models.Index(fields=['user', '-timestamp'], name='userlog_user_time_idx'),
+            # السجلات تضاف بترتيب زمني، لذلك فهرس BRIN صغير جداً ويكفي لمسح النطاقات الزمنية وحذف السجلات القديمة
+            BrinIndex(fields=['timestamp'], name='userlog_time_brin'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_log_type_display()} - {self.timestamp}"
@@ -659,18 +748,41 @@ class Notification(models.Model):
         verbose_name = _('Notification')
         verbose_name_plural = _('Notifications')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'read', '-created_at'], name='notif_user_read_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # عدد الإشعارات غير المقروءة لكل مستخدم
+            models.Index(fields=['user'], condition=models.Q(read=False), name='notif_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
     
+    @classmethod
+    def mark_many_as_read(cls, ids, user=None, read_at=None):
+        """
+        تعليم مجموعة إشعارات كمقروءة بعملية UPDATE واحدة
+        
+        عند تمرير المستخدم يتم تحديث إشعاراته فقط (مثل صندوق الوارد).
+        تعيد عدد الإشعارات التي تم تحديثها.
+        """
+        queryset = cls.objects.filter(pk__in=ids, read=False)
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        return queryset.update(read=True, read_at=read_at or timezone.now())
+    
     def mark_as_read(self):
         """تعليم الإشعار كمقروء"""
-        if not self.read:
-            self.read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=['read', 'read_at'])
-            return True
-        return False
+        if self.read:
+            return False
+        read_at = timezone.now()
+        if not Notification.mark_many_as_read([self.pk], read_at=read_at):
+            # تمت قراءته من طلب آخر
+            self.refresh_from_db(fields=['read', 'read_at'])
+            return False
+        self.read = True
+        self.read_at = read_at
+        return True
     
     def mark_as_unread(self):
         """تعليم الإشعار كغير مقروء"""
@@ -0,0 +1,40 @@
+"""
+ذاكرة مؤقتة لأدوار المستخدمين وصلاحياتها
+
+يتم تخزين أسماء الصلاحيات الممنوحة للمستخدم عبر أدواره (بصيغة
+"app_label.codename") في ذاكرة Django المؤقتة لكل مستخدم، بدلاً من ربط جداول
+UserRole وRole والصلاحيات عند كل طلب. تستخدمها خلفية المصادقة
+RolePermissionBackend (انظر backends.py)، ويتم مسحها عند تعديل أدوار المستخدم
+أو صلاحيات الدور (انظر signals.py).
+"""
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+# مدة صلاحية الذاكرة المؤقتة بالثواني
+USER_PERMS_CACHE_TIMEOUT = 60
+
+
+def _cache_key(user_id):
+    return f'uperm:{user_id}'
+
+
+def get_user_perms(user_id):
+    """أسماء الصلاحيات الممنوحة للمستخدم عبر أدواره (من الذاكرة المؤقتة أو من قاعدة البيانات)"""
+    key = _cache_key(user_id)
+    perms = cache.get(key)
+    if perms is None:
+        perms = frozenset(
+            f"{app_label}.{codename}"
+            for app_label, codename in Permission.objects.filter(
+                roles__user_roles__user_id=user_id
+            ).values_list('content_type__app_label', 'codename').distinct()
+        )
+        cache.set(key, perms, USER_PERMS_CACHE_TIMEOUT)
+    return perms
+
+
+def invalidate_user_perms(*user_ids):
+    """مسح الذاكرة المؤقتة لأدوار وصلاحيات المستخدمين المحددين"""
+    if user_ids:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -2,30 +2,26 @@
 إشارات تطبيق المستخدمين
 """
 
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.utils import timezone
 from django.contrib.auth import user_logged_in, user_logged_out
 from django.contrib.auth.signals import user_login_failed
 
-from .models import User, UserProfile, UserLog
+from .models import User, UserProfile, Role, UserRole
+from .perm_cache import invalidate_user_perms
+from .tasks import queue_user_log
 
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
-    """إنشاء ملف شخصي للمستخدم عند إنشاء مستخدم جديد"""
+    """إنشاء ملف شخصي للمستخدم عند إنشاء مستخدم جديد
+    
+    لا يتم فعل شيء عند تعديل المستخدم (مثل حفظ last_login_ip عند تسجيل الدخول)؛
+    بيانات الملف الشخصي تحفظ من خلال نموذجها مباشرة.
+    """
     if created:
-        UserProfile.objects.create(user=instance)
-
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """حفظ ملف المستخدم الشخصي عند حفظ المستخدم"""
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
-    else:
-        # إذا لم يكن لديه ملف شخصي، قم بإنشاء واحد
-        UserProfile.objects.create(user=instance)
+        # get_or_create لتحمل تحميل البيانات (fixtures) التي تتضمن الملف الشخصي
+        UserProfile.objects.get_or_create(user=instance)
 
 
 @receiver(user_logged_in)
@@ -35,20 +31,16 @@ def log_user_login(sender, request, user, **kwargs):
         ip_address = request.META.get('REMOTE_ADDR', None)
         user_agent = request.META.get('HTTP_USER_AGENT', None)
         
-        # تحديث آخر عنوان IP لتسجيل الدخول
+        # آخر عنوان IP لتسجيل الدخول (يحفظ في قاعدة البيانات مع إدراج السجلات)
         user.last_login_ip = ip_address
-        user.save(update_fields=['last_login_ip'])
         
-        # إنشاء سجل تسجيل الدخول
-        UserLog.objects.create(
-            user=user,
+        # إضافة سجل تسجيل الدخول إلى الطابور
+        queue_user_log(
+            user_id=user.pk,
             log_type='login',
             ip_address=ip_address,
             user_agent=user_agent,
-            details={
-                'session_key': request.session.session_key,
-                'timestamp': timezone.now().isoformat()
-            }
+            session_key=request.session.session_key
         )
 
 
@@ -59,16 +51,13 @@ def log_user_logout(sender, request, user, **kwargs):
         ip_address = request.META.get('REMOTE_ADDR', None)
         user_agent = request.META.get('HTTP_USER_AGENT', None)
         
-        # إنشاء سجل تسجيل الخروج
-        UserLog.objects.create(
-            user=user,
+        # إضافة سجل تسجيل الخروج إلى الطابور
+        queue_user_log(
+            user_id=user.pk,
             log_type='logout',
             ip_address=ip_address,
             user_agent=user_agent,
-            details={
-                'session_key': request.session.session_key,
-                'timestamp': timezone.now().isoformat()
-            }
+            session_key=request.session.session_key
         )
 
 
@@ -83,28 +72,45 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
         username = credentials.get('username', None)
         email = credentials.get('email', None)
         
-        user = None
+        # يكفي معرف المستخدم (دون تحميل صف المستخدم كاملاً)
+        user_id = None
         if email:
-            try:
-                user = User.objects.get(email=email)
-            except User.DoesNotExist:
-                pass
+            user_id = User.objects.filter(email=email).values_list('pk', flat=True).first()
         
-        if username and not user:
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                pass
+        if username and not user_id:
+            user_id = User.objects.filter(username=username).values_list('pk', flat=True).first()
         
-        # إنشاء سجل فشل تسجيل الدخول
-        if user:
-            UserLog.objects.create(
-                user=user,
+        # إضافة سجل فشل تسجيل الدخول إلى الطابور
+        if user_id:
+            queue_user_log(
+                user_id=user_id,
                 log_type='login_failed',
                 ip_address=ip_address,
                 user_agent=user_agent,
-                details={
-                    'timestamp': timezone.now().isoformat(),
-                    'reason': 'Invalid password'
-                }
+                reason='Invalid password'
             )
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def clear_user_perms_cache(sender, instance, **kwargs):
+    """مسح صلاحيات المستخدم المخزنة عند إضافة دور له أو إزالته"""
+    invalidate_user_perms(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def clear_role_users_perms_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """مسح صلاحيات مستخدمي الدور المخزنة عند تعديل صلاحيات الدور"""
+    # عند المسح تحدد الأدوار المتأثرة قبل حذف العلاقات (pre_clear)
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    
+    if not reverse:
+        user_roles = UserRole.objects.filter(role=instance)
+    elif pk_set:
+        # التعديل من جهة الصلاحية: pk_set معرفات الأدوار
+        user_roles = UserRole.objects.filter(role_id__in=pk_set)
+    else:
+        user_roles = UserRole.objects.filter(role__permissions=instance)
+    
+    invalidate_user_perms(*user_roles.values_list('user_id', flat=True).distinct())
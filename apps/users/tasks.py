@@ -0,0 +1,190 @@
+"""
+مهام تطبيق المستخدمين (Celery)
+"""
+
+import json
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+import redis
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import User, UserLog
+
+logger = logging.getLogger(__name__)
+
+# قائمة Redis لسجلات نشاط المستخدمين بانتظار إدراجها في قاعدة البيانات
+USER_LOG_QUEUE_KEY = 'userlog:queue'
+# السجلات التي تعذر فك ترميزها (تنقل إليها بدلاً من إعادة محاولتها إلى ما لا نهاية)
+USER_LOG_DEAD_LETTER_KEY = 'userlog:dead'
+USER_LOG_BATCH_SIZE = 1000
+
+# مهلة الاتصال بـ Redis (بالثواني) حتى لا يتعطل طلب تسجيل الدخول إذا تعذر الوصول إليه
+USER_LOG_QUEUE_TIMEOUT = 0.5
+
+# مدة الاحتفاظ الافتراضية بسجلات النشاط (بالأيام)
+USER_LOG_RETENTION_DAYS = 365
+
+
+@lru_cache(maxsize=1)
+def _redis_client():
+    """اتصال Redis لطابور السجلات (نفس وسيط Celery ما لم يحدد غير ذلك)"""
+    url = getattr(settings, 'USER_LOG_QUEUE_URL', None) or settings.CELERY_BROKER_URL
+    return redis.Redis.from_url(
+        url,
+        socket_connect_timeout=USER_LOG_QUEUE_TIMEOUT,
+        socket_timeout=USER_LOG_QUEUE_TIMEOUT,
+    )
+
+
+def queue_user_log(user_id, log_type, ip_address=None, user_agent=None, session_key=None, reason=None, details=None):
+    """
+    إضافة سجل نشاط للمستخدم إلى الطابور بدلاً من إدراجه أثناء الطلب
+
+    يتم إدراج السجلات دفعة واحدة بواسطة المهمة الدورية flush_user_logs.
+    إذا تعذر الوصول إلى Redis يتم حفظ السجل مباشرة حتى لا يضيع.
+    """
+    entry = {
+        'user_id': user_id,
+        'log_type': log_type,
+        'timestamp': timezone.now().isoformat(),
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'session_key': session_key,
+        'reason': reason,
+        'details': details,
+    }
+    try:
+        _redis_client().rpush(USER_LOG_QUEUE_KEY, json.dumps(entry))
+    except redis.RedisError:
+        logger.warning("User log queue is unavailable; writing log synchronously", exc_info=True)
+        _create_logs([entry])
+
+
+# الحقول المطلوبة في كل سجل بالطابور
+_REQUIRED_ENTRY_KEYS = frozenset({'user_id', 'log_type', 'timestamp'})
+
+
+def _decode_entry(item):
+    """فك ترميز سجل من الطابور (None إذا كان تالفاً)"""
+    try:
+        entry = json.loads(item)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or not _REQUIRED_ENTRY_KEYS <= entry.keys():
+        return None
+    return entry
+
+
+@transaction.atomic
+def _create_logs(entries):
+    """
+    إدراج السجلات بعملية bulk_create واحدة وتحديث آخر عنوان IP لتسجيل الدخول
+    
+    يتم ذلك في معاملة واحدة حتى لا تدرج السجلات مرتين إذا فشل التحديث
+    وأعيدت الدفعة إلى الطابور.
+    """
+    user_ids = {entry['user_id'] for entry in entries}
+    # تجاهل سجلات المستخدمين المحذوفين حتى لا تفشل الدفعة كاملة
+    existing_ids = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+    logs = []
+    last_login_ips = {}
+    for entry in entries:
+        if entry['user_id'] not in existing_ids:
+            continue
+        logs.append(UserLog(
+            user_id=entry['user_id'],
+            log_type=entry['log_type'],
+            timestamp=parse_datetime(entry['timestamp']),
+            ip_address=entry['ip_address'],
+            user_agent=entry['user_agent'],
+            session_key=entry.get('session_key'),
+            reason=entry.get('reason'),
+            details=entry['details'],
+        ))
+        if entry['log_type'] == 'login':
+            # السجلات مرتبة زمنياً، لذلك يبقى آخر عنوان لكل مستخدم
+            last_login_ips[entry['user_id']] = entry['ip_address']
+
+    UserLog.objects.bulk_create(logs, batch_size=USER_LOG_BATCH_SIZE)
+
+    # تحديث واحد لكل عنوان IP بدلاً من حفظ كل مستخدم على حدة
+    users_by_ip = {}
+    for user_id, ip_address in last_login_ips.items():
+        users_by_ip.setdefault(ip_address, []).append(user_id)
+    for ip_address, ids in users_by_ip.items():
+        User.objects.filter(pk__in=ids).update(last_login_ip=ip_address)
+
+    return len(logs)
+
+
+@shared_task
+def flush_user_logs(batch_size=USER_LOG_BATCH_SIZE):
+    """إدراج سجلات نشاط المستخدمين المنتظرة في الطابور دفعة واحدة"""
+    client = _redis_client()
+    created = 0
+    while True:
+        # سحب دفعة من الطابور بشكل ذري (MULTI/EXEC)
+        pipe = client.pipeline()
+        pipe.lrange(USER_LOG_QUEUE_KEY, 0, batch_size - 1)
+        pipe.ltrim(USER_LOG_QUEUE_KEY, batch_size, -1)
+        items, _trimmed = pipe.execute()
+        if not items:
+            break
+
+        valid_items = []
+        entries = []
+        for item in items:
+            entry = _decode_entry(item)
+            if entry is None:
+                # سجل تالف: نقله إلى قائمة منفصلة حتى لا تفشل الدفعة في كل محاولة
+                logger.error("Moving undecodable user log entry to %s: %r", USER_LOG_DEAD_LETTER_KEY, item[:200])
+                client.rpush(USER_LOG_DEAD_LETTER_KEY, item)
+                continue
+            valid_items.append(item)
+            entries.append(entry)
+        
+        if entries:
+            try:
+                created += _create_logs(entries)
+            except Exception:
+                # إعادة الدفعة إلى بداية الطابور بنفس الترتيب لمحاولة لاحقة
+                client.lpush(USER_LOG_QUEUE_KEY, *reversed(valid_items))
+                raise
+
+        if len(items) < batch_size:
+            break
+    return created
+
+
+@shared_task
+def purge_user_logs(retention_days=None, batch_size=10000):
+    """
+    حذف سجلات النشاط الأقدم من مدة الاحتفاظ على دفعات
+    
+    الحذف على دفعات صغيرة حتى لا تطول الأقفال أو تتضخم المعاملة الواحدة.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'USER_LOG_RETENTION_DAYS', USER_LOG_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    
+    deleted = 0
+    while True:
+        ids = list(
+            UserLog.objects.filter(timestamp__lt=cutoff)
+            .order_by()
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        count, _details = UserLog.objects.filter(pk__in=ids).delete()
+        deleted += count
+        if len(ids) < batch_size:
+            break
+    return deleted
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # فهارس trigram للبحث
     # تطبيقات المشروع
     'apps.core.apps.CoreConfig',  # إضافة تطبيق core
     'apps.university'
@@ -75,9 +76,6 @@ LANGUAGES = [
 # تمكين ميزة الترجمة
 USE_I18N = True
 
-# تمكين تنسيق الأرقام والتاريخ حسب اللغة
-USE_L10N = True
-
 # مسارات ملفات الترجمة
 LOCALE_PATHS = [
     os.path.join(BASE_DIR.parent, 'locale'),
@@ -89,11 +87,6 @@ LANGUAGE_COOKIE_AGE = 60 * 60 * 24 * 365  # مدة صلاحية ملف تعري
 LANGUAGE_COOKIE_DOMAIN = None  # نطاق ملف تعريف ارتباط اللغة
 LANGUAGE_COOKIE_PATH = '/'  # مسار ملف تعريف ارتباط اللغة
 
-# تكوين الكاش للترجمة
-USE_I18N_CACHE = True  # تفعيل التخزين المؤقت للترجمة
-I18N_CACHE_KEY_PREFIX = 'i18n'  # بادئة مفتاح التخزين المؤقت للترجمة
-I18N_CACHE_TIMEOUT = 60 * 60 * 24  # مدة التخزين المؤقت للترجمة (24 ساعة)
-
 # إعدادات تنسيق التاريخ والوقت
 DATE_FORMAT = 'Y-m-d'
 TIME_FORMAT = 'H:i'
@@ -107,8 +100,74 @@ SHORT_DATETIME_FORMAT = 'Y-m-d H:i'
 TIME_ZONE = 'UTC'
 USE_TZ = True
 
+# الذاكرة المؤقتة المشتركة بين العمليات
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env("CACHE_URL", default="redis://redis:6379/1"),
+        'OPTIONS': {
+            # حد أعلى لاتصالات Redis في كل عملية (تمرر إلى مجمع الاتصالات)
+            'max_connections': env.int("CACHE_MAX_CONNECTIONS", default=100),
+        },
+    }
+}
+
+# قراءة الجلسات من الذاكرة المؤقتة، مع حفظها في قاعدة البيانات أيضاً
+# حتى لا يتم تسجيل خروج المستخدمين عند إفراغ Redis
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# هل تطبيق المستخدمين (apps.users) مثبت؟ خلفية المصادقة ومهامه الدورية تعتمد على نماذجه
+USERS_APP_INSTALLED = any(
+    app == 'apps.users' or app.startswith('apps.users.') for app in INSTALLED_APPS
+)
+
+# خلفيات المصادقة (صلاحيات أدوار المستخدمين تقرأ من الذاكرة المؤقتة المشتركة)
+if USERS_APP_INSTALLED:
+    AUTHENTICATION_BACKENDS = ['apps.users.backends.RolePermissionBackend']
+
+# خوارزميات تشفير كلمات المرور (الأولى للكلمات الجديدة، والباقي للتحقق من الكلمات القديمة
+# وإعادة تشفيرها تلقائياً عند تسجيل الدخول)
+PASSWORD_HASHERS = [
+    'apps.users.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # إعدادات Celery
 CELERY_BROKER_URL = env("CELERY_BROKER", default="redis://redis:6379/0")
+CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND", default="redis://redis:6379/2")
+CELERY_RESULT_EXPIRES = 60 * 60  # حذف نتائج المهام بعد ساعة
+
+# تسلسل ثنائي أصغر وأسرع من JSON للرسائل والنتائج
+CELERY_TASK_SERIALIZER = 'msgpack'
+CELERY_RESULT_SERIALIZER = 'msgpack'
+CELERY_ACCEPT_CONTENT = ['msgpack', 'json']
+
+# مجمع اتصالات بالوسيط بدلاً من فتح اتصال جديد مع كل إرسال
+CELERY_BROKER_POOL_LIMIT = 50
+
+# مدة الاحتفاظ بسجلات نشاط المستخدمين (بالأيام)
+USER_LOG_RETENTION_DAYS = env.int("USER_LOG_RETENTION_DAYS", default=365)
+
+# المهام الدورية
+CELERY_BEAT_SCHEDULE = {}
+
+# مهام تطبيق المستخدمين لا تسجل في Celery (autodiscover_tasks) إلا عند تثبيته
+if USERS_APP_INSTALLED:
+    CELERY_BEAT_SCHEDULE.update({
+        # إدراج سجلات نشاط المستخدمين من الطابور دفعة واحدة
+        'flush-user-logs': {
+            'task': 'apps.users.tasks.flush_user_logs',
+            'schedule': 5.0,
+        },
+        # حذف سجلات النشاط الأقدم من USER_LOG_RETENTION_DAYS مرة يومياً
+        'purge-user-logs': {
+            'task': 'apps.users.tasks.purge_user_logs',
+            'schedule': 60 * 60 * 24,
+        },
+    })
 
 # إعدادات الملفات الثابتة
 STATIC_URL = 'static/'
@@ -9,6 +9,13 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        # إبقاء الاتصال مفتوحاً بين الطلبات بدلاً من إعادة المصافحة مع كل طلب
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=600),
+        # التحقق من صلاحية الاتصال المعاد استخدامه قبل أول استعلام في الطلب
+        'CONN_HEALTH_CHECKS': True,
+        # عند التوجيه عبر pgbouncer بوضع transaction (عادة على المنفذ 6432)
+        # يجب تعطيل المؤشرات من جهة الخادم لأنها لا تعمل عبر المعاملات
+        'DISABLE_SERVER_SIDE_CURSORS': env.bool('DB_PGBOUNCER', default=False),
     }
 }
 